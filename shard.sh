@@ -0,0 +1,13 @@
+# build the site as N shard processes, then merge them into docs/
+# usage: ./shard.sh N [basepath]
+shards=${1:-2}
+basepath=${2:-/}
+pids=""
+for i in $(seq 1 "$shards"); do
+    python3 src/main.py "$basepath" --shard "$i/$shards" &
+    pids="$pids $!"
+done
+for pid in $pids; do
+    wait "$pid" || exit 1
+done
+python3 src/main.py "$basepath" --merge-shards "$shards"
@@ -0,0 +1,126 @@
+from concurrent.futures import ThreadPoolExecutor
+import os, time
+from manifest import hash_file
+from publish import copy_file
+
+
+def prune_empty_dirs(path, root):
+    # walk up from path removing directories that are now empty, stopping at root
+    parent = path
+    while os.path.abspath(parent) != os.path.abspath(root):
+        if not os.path.isdir(parent) or os.listdir(parent):
+            break
+        os.rmdir(parent)
+        parent = os.path.dirname(parent)
+
+
+def remove_stale_files(root, keep):
+    # delete every file under root whose relative path isn't in keep
+    removed = 0
+    for relative_path in list_files(root):
+        if relative_path in keep:
+            continue
+        path = os.path.join(root, relative_path)
+        os.remove(path)
+        print(f"Removing file: {path}")
+        prune_empty_dirs(os.path.dirname(path), root)
+        removed += 1
+    return removed
+
+
+def list_files(source):
+    files = []
+    for root, dirs, names in os.walk(source):
+        dirs.sort()
+        for name in sorted(names):
+            files.append(os.path.relpath(os.path.join(root, name), source))
+    return files
+
+
+def scan_static(source):
+    # the same entries sync_static records, without copying anything
+    assets = {}
+    if os.path.exists(source):
+        for relative_path in list_files(source):
+            source_stat = os.stat(os.path.join(source, relative_path))
+            assets[relative_path] = {"size": source_stat.st_size, "mtime": source_stat.st_mtime_ns}
+    return assets
+
+
+def asset_unchanged(source_path, destination_path, source_stat, previous_entry):
+    try:
+        destination_stat = os.stat(destination_path)
+    except FileNotFoundError:
+        return False
+    if destination_stat.st_size != source_stat.st_size:
+        return False
+    if previous_entry is not None and previous_entry["size"] == source_stat.st_size and previous_entry["mtime"] == source_stat.st_mtime_ns:
+        return True
+    if destination_stat.st_mtime_ns == source_stat.st_mtime_ns:
+        return True
+    # same size but the mtimes don't settle it, compare the bytes
+    return hash_file(source_path) == hash_file(destination_path)
+
+
+def copy_assets(copies, jobs=1, link=False):
+    # copies is a list of (source_path, destination_path, size)
+    if not copies:
+        return
+    started = time.perf_counter()
+    if jobs > 1 and len(copies) > 1:
+        # small files are dominated by open/close latency, so overlap them on a few threads
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = [executor.submit(copy_file, source_path, destination_path, link) for source_path, destination_path, size in copies]
+            for future in futures:
+                future.result()
+    else:
+        for source_path, destination_path, size in copies:
+            copy_file(source_path, destination_path, link)
+    elapsed = time.perf_counter() - started
+
+    total_mb = sum(size for source_path, destination_path, size in copies) / (1 << 20)
+    rate = total_mb / elapsed if elapsed > 0 else 0.0
+    print(f"Copied {len(copies)} files, {total_mb:.1f} MB in {elapsed:.2f}s ({rate:.1f} MB/s)")
+
+
+def sync_static(source, destination, previous=None, jobs=1, link=False):
+    # previous maps relative path -> {"size", "mtime"} from the last sync
+    if previous is None:
+        previous = {}
+    assets = {}
+    copies = []
+    unchanged = 0
+
+    if os.path.exists(source):
+        for relative_path in list_files(source):
+            source_path = os.path.join(source, relative_path)
+            destination_path = os.path.join(destination, relative_path)
+            source_stat = os.stat(source_path)
+            assets[relative_path] = {"size": source_stat.st_size, "mtime": source_stat.st_mtime_ns}
+
+            if asset_unchanged(source_path, destination_path, source_stat, previous.get(relative_path)):
+                unchanged += 1
+                continue
+
+            os.makedirs(os.path.dirname(destination_path), exist_ok=True)
+            print(f"Copying file: {source_path}")
+            copies.append((source_path, destination_path, source_stat.st_size))
+
+    # copy_file keeps the mtime, which is what makes the next comparison cheap
+    copy_assets(copies, jobs, link)
+    copied = len(copies)
+
+    # only remove files this sync put there, never generated pages
+    removed = 0
+    for relative_path in previous:
+        if relative_path in assets:
+            continue
+        destination_path = os.path.join(destination, relative_path)
+        if os.path.exists(destination_path):
+            os.remove(destination_path)
+            print(f"Removing file: {destination_path}")
+        prune_empty_dirs(os.path.dirname(destination_path), destination)
+        removed += 1
+
+    print(f"Assets copied: {copied}, unchanged: {unchanged}, removed: {removed}")
+    return assets, copied, unchanged, removed
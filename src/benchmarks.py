@@ -0,0 +1,268 @@
+import glob, os, sys, time, tracemalloc
+from htmlnode import HTMLNode, LeafNode, ParentNode, escape_html
+from textnode import TextNode, TextType
+from inlinemarkdown import text_node_to_html_node, tokenize_inline
+from flatir import markdown_to_flat_document
+from transforms import ExternalLinks, HeadingIds, LazyImages, Transforms
+from markdownblock import markdown_to_html_node
+
+
+def repeat_to_size(fragment, size):
+    return fragment * (size // len(fragment) + 1)
+
+
+def pathological_inputs(size):
+    # name -> markdown of roughly size bytes that used to hit a slow or failing path
+    return {
+        "link fragments": repeat_to_size("[a](b [c] ![d](", size),
+        "image fragments": repeat_to_size("![x ", size),
+        "open brackets": "[" * size,
+        "open parens": "[a](" + "(" * size,
+        "snake_case": repeat_to_size("some snake_case_identifier and _another ", size),
+        "unclosed underscores": repeat_to_size(" _a", size),
+        "unclosed bold": repeat_to_size("**a ", size),
+        "unclosed code": repeat_to_size("`a ", size),
+        "ordered list dots": "1. " + "." * size,
+        "ordered list digits": "1. " + "1" * size + ".",
+        "long list": repeat_to_size("- item _with_ **some** `code`\n", size),
+        "long quote": repeat_to_size("> quoted _line_\n", size),
+        "many blocks": repeat_to_size("para [link](/x) text\n\n", size),
+        "unclosed fence": "```\n" + repeat_to_size("code line\n\n", size),
+        "deep list": "".join(" " * depth + "- item\n" for depth in range(int((2 * size) ** 0.5))),
+        "changelog list": repeat_to_size("1. release\n   - fix _this_\n     wrapped\n   - and **that**\n\n   notes\n", size),
+        "long table": "| a | b | c |\n|:--|:-:|--:|\n" + repeat_to_size("| x | **y** | `z` |\n", size),
+        "wide table": "|" + "h|" * (size // 4) + "\n|" + "-|" * (size // 4) + "\n|" + "c|" * (size // 4),
+        "escaped pipes": "| a |\n|---|\n| " + "\\|" * (size // 2) + " |",
+        "pipes without delimiter": repeat_to_size("a | b | c\n", size),
+    }
+
+
+def table_markdown(rows):
+    lines = ["| id | name | amount |", "|---:|:-----|-------:|"]
+    lines.extend(f"| {i} | item _{i}_ | {i * 3} |" for i in range(rows))
+    return "\n".join(lines)
+
+
+def time_render(markdown):
+    started = time.perf_counter()
+    markdown_to_html_node(markdown).to_html()
+    return time.perf_counter() - started
+
+
+def seconds_per_mb(markdown):
+    return time_render(markdown) / (len(markdown) / (1 << 20))
+
+
+def bench_pathological(size=1 << 20):
+    print(f"{'input':<24}{'MB':>8}{'seconds':>10}{'s/MB':>8}")
+    for name, markdown in pathological_inputs(size).items():
+        elapsed = time_render(markdown)
+        mb = len(markdown) / (1 << 20)
+        print(f"{name:<24}{mb:>8.2f}{elapsed:>10.3f}{elapsed / mb:>8.2f}")
+
+
+def bench_table(rows=100_000):
+    # doubling the rows should double the time
+    print(f"{'rows':>8}{'MB':>8}{'seconds':>10}{'s/MB':>8}")
+    for count in (rows // 2, rows):
+        markdown = table_markdown(count)
+        elapsed = time_render(markdown)
+        mb = len(markdown) / (1 << 20)
+        print(f"{count:>8}{mb:>8.2f}{elapsed:>10.3f}{elapsed / mb:>8.2f}")
+
+
+def corpus_markdown(size, content_dir="content"):
+    # the site's own pages repeated up to size, or a stand-in when run elsewhere
+    pages = []
+    for path in sorted(glob.glob(os.path.join(content_dir, "**", "*.md"), recursive=True)):
+        with open(path) as f:
+            pages.append(f.read())
+    text = "\n\n".join(pages) or "# Title\n\nSome **text** & a [link](/x?a=1&b=2) <here>.\n"
+    return repeat_to_size(text + "\n\n", size)
+
+
+def bench_escape(size=4 << 20):
+    # escaping every line of the corpus is more work than rendering does,
+    # so this is an upper bound on what escaping adds
+    markdown = corpus_markdown(size)
+    render_seconds = time_render(markdown)
+    lines = markdown.split("\n")
+    started = time.perf_counter()
+    for line in lines:
+        escape_html(line)
+    escape_seconds = time.perf_counter() - started
+    plain = [line for line in lines if escape_html(line) is line]
+    print(f"{len(markdown) / (1 << 20):.2f} MB, {len(plain) / len(lines):.0%} of lines take the fast path")
+    print(f"render {render_seconds:.3f}s, escaping {escape_seconds:.3f}s ({escape_seconds / render_seconds:.1%} of render)")
+
+
+class NullSink:
+    # counts what would be written, so a benchmark can render without keeping output
+    def __init__(self):
+        self.size = 0
+
+    def write(self, text):
+        self.size += len(text)
+
+
+def deep_tree(depth, payload):
+    node = LeafNode("span", payload)
+    for _ in range(depth):
+        node = ParentNode("div", [node])
+    return node
+
+
+def wide_tree(width):
+    return ParentNode("ul", [ParentNode("li", [LeafNode("b", f"item {i}"), LeafNode(None, " text")]) for i in range(width)])
+
+
+def measure(render):
+    # timed without tracemalloc, which slows every allocation, then run again for the peak
+    started = time.perf_counter()
+    render()
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    render()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def bench_tree(depth=200, payload_size=1 << 20, width=200_000):
+    # the payload is copied once, not once per level it is nested in
+    trees = {
+        f"deep ({depth} levels, {payload_size >> 20} MB leaf)": deep_tree(depth, "x" * payload_size),
+        f"wide ({width} items)": wide_tree(width),
+    }
+    print(f"{'tree':<36}{'sink':<10}{'seconds':>10}{'peak MB':>10}")
+    for name, tree in trees.items():
+        for sink_name, render in (("string", tree.to_html), ("null", lambda: tree.write_html(NullSink()))):
+            elapsed, peak = measure(render)
+            print(f"{name:<36}{sink_name:<10}{elapsed:>10.3f}{peak / (1 << 20):>10.1f}")
+
+
+def unslotted(cls):
+    # the same class with an ordinary per-instance __dict__, to compare against
+    return type(f"Plain{cls.__name__}", (), {"__init__": cls.__init__})
+
+
+def allocation_cost(make, count):
+    # (bytes per object, seconds per million objects); timed without tracemalloc, which slows allocation
+    started = time.perf_counter()
+    objects = [make(i) for i in range(count)]
+    elapsed = time.perf_counter() - started
+    del objects
+    tracemalloc.start()
+    objects = [make(i) for i in range(count)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return size / count, elapsed / count * 1e6
+
+
+def bench_nodes(count=200_000, size=4 << 20):
+    plain_text_node = unslotted(TextNode)
+    plain_html_node = unslotted(HTMLNode)
+    makers = {
+        "TextNode": (lambda i: TextNode("text", TextType.BOLD), lambda i: plain_text_node("text", TextType.BOLD)),
+        "HTMLNode": (lambda i: HTMLNode("b", "text"), lambda i: plain_html_node("b", "text")),
+    }
+    print(f"{'node':<12}{'bytes (dict)':>14}{'bytes (slots)':>15}{'s/M (dict)':>12}{'s/M (slots)':>13}")
+    for name, (slotted, plain) in makers.items():
+        plain_bytes, plain_seconds = allocation_cost(plain, count)
+        slotted_bytes, slotted_seconds = allocation_cost(slotted, count)
+        print(f"{name:<12}{plain_bytes:>14.0f}{slotted_bytes:>15.0f}{plain_seconds:>12.3f}{slotted_seconds:>13.3f}")
+
+    # the inline layer over a real corpus, where most nodes are made
+    lines = [line for line in corpus_markdown(size).split("\n") if line]
+    started = time.perf_counter()
+    nodes = [text_node_to_html_node(node) for line in lines for node in tokenize_inline(line)]
+    elapsed = time.perf_counter() - started
+    del nodes
+    tracemalloc.start()
+    nodes = [text_node_to_html_node(node) for line in lines for node in tokenize_inline(line)]
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"corpus: {len(nodes)} nodes from {size >> 20} MB in {elapsed:.3f}s, {peak / len(nodes):.0f} bytes per node at peak")
+
+
+def bench_flat(size=4 << 20):
+    # the object tree against the flat arrays for the same corpus. The flat
+    # document escapes its text while it is built, so its build is slower and
+    # its render faster
+    markdown = corpus_markdown(size)
+    builders = {"tree": markdown_to_html_node, "flat": markdown_to_flat_document}
+    print(f"{'ir':<8}{'build s':>10}{'render s':>10}{'total s':>10}{'bytes/node':>12}")
+    nodes = None
+    results = {}
+    for name, build in builders.items():
+        started = time.perf_counter()
+        document = build(markdown)
+        build_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        document.to_html()
+        render_seconds = time.perf_counter() - started
+        del document
+        tracemalloc.start()
+        document = build(markdown)
+        retained = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        if nodes is None:
+            # the flat document counts every node, including text nodes
+            nodes = len(markdown_to_flat_document(markdown))
+        del document
+        total = build_seconds + render_seconds
+        results[name] = (total, retained)
+        print(f"{name:<8}{build_seconds:>10.3f}{render_seconds:>10.3f}{total:>10.3f}{retained / nodes:>12.0f}")
+    time_ratio = results["flat"][0] / results["tree"][0]
+    memory_ratio = results["flat"][1] / results["tree"][1]
+    print(f"flat: {time_ratio:.2f}x the tree's time end to end, {memory_ratio:.2f}x its memory; it is a memory saving, not a speedup")
+
+
+def bench_transforms(size=4 << 20):
+    # the built-in transforms in one walk against a walk per transform
+    markdown = corpus_markdown(size)
+    started = time.perf_counter()
+    markdown_to_html_node(markdown)
+    base = time.perf_counter() - started
+    plugins = [ExternalLinks, HeadingIds, LazyImages]
+    runs = {
+        "one walk": lambda tree: Transforms(plugin() for plugin in plugins).apply(tree),
+        "walk each": lambda tree: [Transforms([plugin()]).apply(tree) for plugin in plugins],
+    }
+    print(f"no transforms: {base:.3f}s")
+    seconds = {}
+    for name, run in runs.items():
+        tree = markdown_to_html_node(markdown)
+        started = time.perf_counter()
+        run(tree)
+        seconds[name] = time.perf_counter() - started
+        print(f"{name:<10}{seconds[name]:>8.3f}s")
+    print(f"one walk / walk each: {seconds['one walk'] / seconds['walk each']:.2f}")
+    transforms = Transforms(plugin() for plugin in plugins)
+    started = time.perf_counter()
+    markdown_to_html_node(markdown, transforms=transforms)
+    print(f"while building: {time.perf_counter() - started:.3f}s")
+    transforms.report()
+
+
+BENCHMARKS = {
+    "pathological": bench_pathological,
+    "table": bench_table,
+    "escape": bench_escape,
+    "tree": bench_tree,
+    "nodes": bench_nodes,
+    "flat": bench_flat,
+    "transforms": bench_transforms,
+}
+
+
+def main():
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print(f"== {name}")
+        BENCHMARKS[name]()
+
+
+if __name__ == "__main__":
+    main()
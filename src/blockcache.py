@@ -0,0 +1,145 @@
+import hashlib, os, sqlite3, time
+
+# bump whenever block rendering changes, so old fragments are never served
+RENDER_VERSION = 9
+DEFAULT_MAX_BYTES = 256 << 20
+# LRU timestamps are written back in batches, not on every hit
+TOUCH_BATCH = 1024
+# new fragments are written in short transactions of this many, so no process
+# holds the write lock while it renders and other workers and shards can write
+WRITE_BATCH = 64
+# how long a writer waits for another process's transaction
+LOCK_TIMEOUT = 60
+
+
+def block_key(block_type, lines, context=""):
+    # context covers anything else the html depends on, e.g. the page's definitions
+    digest = hashlib.sha256(f"{RENDER_VERSION}\0{block_type.value}\0{context}\0".encode("utf-8"))
+    digest.update("\n".join(lines).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class BlockCache:
+    # rendered block html on disk, keyed by a hash of the block's type and text
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.connection = None
+        self.touched = set()
+        # key -> (html, last used) for fragments put since the last write
+        self.pending = {}
+
+    def connect(self):
+        if self.connection is None:
+            cache_dir = os.path.dirname(self.path)
+            if cache_dir:
+                os.makedirs(cache_dir, exist_ok=True)
+            # page workers share the file, so wait on their locks rather than fail
+            self.connection = sqlite3.connect(self.path, timeout=LOCK_TIMEOUT)
+            self.set_up()
+        return self.connection
+
+    def set_up(self):
+        # switching a new file to WAL fails at once, without waiting, while another
+        # process is doing the same, so retry until it is done or LOCK_TIMEOUT passes
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while True:
+            try:
+                self.connection.execute("PRAGMA journal_mode=WAL")
+                break
+            except sqlite3.OperationalError:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.01)
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS blocks ("
+            "key TEXT PRIMARY KEY, html TEXT NOT NULL, size INTEGER NOT NULL, used INTEGER NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS blocks_used ON blocks (used)")
+
+    def get(self, key):
+        entry = self.pending.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.pending[key] = (entry[0], time.time_ns())
+            return entry[0]
+        row = self.connect().execute("SELECT html FROM blocks WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.touched.add(key)
+        if len(self.touched) >= TOUCH_BATCH:
+            self.flush()
+        return row[0]
+
+    def put(self, key, html):
+        self.pending[key] = (html, time.time_ns())
+        if len(self.pending) >= WRITE_BATCH:
+            self.flush()
+
+    def flush(self):
+        # one short transaction for the pending fragments and LRU touches, committed at once
+        if self.connection is None and not self.pending:
+            return
+        self.connect()
+        if self.pending:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO blocks (key, html, size, used) VALUES (?, ?, ?, ?)",
+                ((key, html, len(html.encode("utf-8")), used) for key, (html, used) in self.pending.items()),
+            )
+            self.pending = {}
+        if self.touched:
+            now = time.time_ns()
+            self.connection.executemany(
+                "UPDATE blocks SET used = ? WHERE key = ?", ((now, key) for key in self.touched)
+            )
+            self.touched = set()
+        self.connection.commit()
+
+    def evict(self):
+        # drop least recently used fragments until the cache fits under max_bytes
+        self.flush()
+        connection = self.connect()
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM blocks").fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        evicted = []
+        for key, size in connection.execute("SELECT key, size FROM blocks ORDER BY used"):
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        connection.executemany("DELETE FROM blocks WHERE key = ?", evicted)
+        connection.commit()
+        return len(evicted)
+
+    def entries(self):
+        self.flush()
+        return self.connect().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blocks").fetchone()
+
+    def close(self):
+        self.flush()
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def report(self):
+        lookups = self.hits + self.misses
+        hit_rate = 100 * self.hits / lookups if lookups else 0
+        count, size = self.entries()
+        print(f"Block cache: {self.hits} hits, {self.misses} misses ({hit_rate:.0f}% hit rate), "
+              f"{count} blocks, {size / (1 << 20):.1f} MB")
+
+    def __getstate__(self):
+        # a worker process gets the path and opens its own connection, with fresh counts
+        return {"path": self.path, "max_bytes": self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"], state["max_bytes"])
+
+    def __repr__(self):
+        return f"BlockCache({self.path}, hits: {self.hits}, misses: {self.misses})"
@@ -0,0 +1,87 @@
+import hashlib, re
+
+# [label]: url "optional title" on one line, [^label]: footnote text followed by
+# any indented lines that continue it
+LINK_DEFINITION_PATTERN = re.compile(r"""\[([^\[\]^][^\[\]]*)\]:\s*<?([^\s<>]+)>?(?:\s+("[^"]*"|'[^']*'|\([^()]*\)))?\s*$""")
+FOOTNOTE_DEFINITION_PATTERN = re.compile(r"\[\^([^\[\]\s]+)\]:\s*(.*)$")
+
+
+def normalize_label(label):
+    # labels match case-insensitively and ignore runs of whitespace
+    return " ".join(label.split()).lower()
+
+
+class Definitions:
+    # link and footnote definitions of one document, collected while its blocks are scanned
+    def __init__(self):
+        self.links = {}
+        # label -> (number, text), numbered in definition order so every block
+        # can render its references without knowing about the others
+        self.footnotes = {}
+        # label -> how many references to it the page has rendered so far
+        self.references = {}
+        # the footnote that indented lines after its definition continue
+        self.open_footnote = None
+        self._fingerprint = None
+
+    def add(self, line):
+        # line is stripped; returns True when it was a definition
+        match = FOOTNOTE_DEFINITION_PATTERN.match(line)
+        if match:
+            label = match.group(1)
+            self.open_footnote = None
+            if label not in self.footnotes:
+                self.footnotes[label] = (len(self.footnotes) + 1, match.group(2).strip())
+                self.open_footnote = label
+                self._fingerprint = None
+            return True
+        match = LINK_DEFINITION_PATTERN.match(line)
+        if match:
+            # the first definition of a label wins
+            label = normalize_label(match.group(1))
+            if label and label not in self.links:
+                self.links[label] = match.group(2)
+                self._fingerprint = None
+            return True
+        return False
+
+    def continue_footnote(self, text):
+        # a continuation line of the footnote defined last; ignored after a repeated definition
+        if self.open_footnote is not None:
+            number, footnote_text = self.footnotes[self.open_footnote]
+            self.footnotes[self.open_footnote] = (number, f"{footnote_text} {text}" if footnote_text else text)
+
+    def link(self, label):
+        return self.links.get(normalize_label(label))
+
+    def footnote(self, label):
+        return self.footnotes.get(label)
+
+    def footnote_reference(self, label):
+        # (number, id) for the next reference to label in document order: the first
+        # is fnref-N, which the footnote links back to, later ones fnref-N-2, fnref-N-3, ...
+        entry = self.footnotes.get(label)
+        if entry is None:
+            return None
+        count = self.references.get(label, 0) + 1
+        self.references[label] = count
+        number = entry[0]
+        return number, f"fnref-{number}" if count == 1 else f"fnref-{number}-{count}"
+
+    def fingerprint(self):
+        # stands in for the definitions in block cache keys
+        if self._fingerprint is None:
+            digest = hashlib.sha256()
+            for label, url in sorted(self.links.items()):
+                digest.update(f"{label}\0{url}\0".encode("utf-8"))
+            digest.update(b"\1")
+            for label, (number, text) in sorted(self.footnotes.items()):
+                digest.update(f"{label}\0{number}\0".encode("utf-8"))
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def __bool__(self):
+        return bool(self.links or self.footnotes)
+
+    def __repr__(self):
+        return f"Definitions(links: {self.links}, footnotes: {self.footnotes})"
@@ -0,0 +1,48 @@
+import posixpath, re
+from inlinemarkdown import extract_markdown_images
+
+DEFINITION_URL_PATTERN = re.compile(r"^[ \t]*\[[^\[\]^][^\[\]]*\]:[ \t]*<?([^\s<>]+)", re.MULTILINE)
+
+
+def asset_fingerprint(asset_entry):
+    return f"{asset_entry['size']}:{asset_entry['mtime']}"
+
+
+def resolve_asset(url, content_relative_path, assets):
+    # map an image url from a page onto a path under static/, or None if it isn't one of ours
+    if not url or "://" in url or url.startswith(("data:", "//", "#")):
+        return None
+    url = url.split("#", 1)[0].split("?", 1)[0]
+    if url.startswith("/"):
+        asset_path = posixpath.normpath(url[1:])
+    else:
+        page_dir = posixpath.dirname(content_relative_path.replace("\\", "/"))
+        asset_path = posixpath.normpath(posixpath.join(page_dir, url))
+    if asset_path in assets:
+        return asset_path
+    return None
+
+
+def referenced_images(markdown):
+    urls = [url for alt_text, url in extract_markdown_images(markdown)]
+    # ![alt][label] images get their url from a definition; non-asset urls are dropped later
+    urls.extend(DEFINITION_URL_PATTERN.findall(markdown))
+    return urls
+
+
+def page_dependencies(image_urls, content_relative_path, assets):
+    # asset path -> fingerprint for every static file the page pulls in
+    dependencies = {}
+    for url in image_urls:
+        asset_path = resolve_asset(url, content_relative_path, assets)
+        if asset_path is not None:
+            dependencies[asset_path] = asset_fingerprint(assets[asset_path])
+    return dependencies
+
+
+def dependencies_changed(dependencies, assets):
+    for asset_path, fingerprint in dependencies.items():
+        asset_entry = assets.get(asset_path)
+        if asset_entry is None or asset_fingerprint(asset_entry) != fingerprint:
+            return True
+    return False
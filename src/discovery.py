@@ -0,0 +1,100 @@
+import fnmatch, os, time
+
+DEFAULT_INCLUDE = ("*.md",)
+
+# directories modified this recently may still change within the same mtime tick
+RACY_WINDOW_NS = 2_000_000_000
+
+
+class Page:
+    def __init__(self, relative_path, size, mtime):
+        self.relative_path = relative_path
+        self.size = size
+        self.mtime = mtime
+
+    @property
+    def html_relative_path(self):
+        # swap only the extension, "notes.md.bak/x.md" must not become "notes.html.bak/x.html"
+        root, ext = os.path.splitext(self.relative_path)
+        return root + ".html"
+
+    def __eq__(self, other):
+        if isinstance(other, Page):
+            return (self.relative_path == other.relative_path and
+                    self.size == other.size and
+                    self.mtime == other.mtime)
+        return False
+
+    def __repr__(self):
+        return f"Page({self.relative_path}, {self.size}, {self.mtime})"
+
+
+def matches(relative_path, patterns):
+    return any(fnmatch.fnmatch(relative_path, pattern) for pattern in patterns)
+
+
+def list_directory(path, relative_dir, snapshot, now):
+    # returns (file names, subdirectory names, file name -> DirEntry), from the
+    # snapshot when the directory hasn't changed; entries only come with a fresh scan
+    mtime = os.stat(path).st_mtime_ns
+    cached = snapshot.get(relative_dir)
+    if cached is not None and cached["mtime"] == mtime:
+        return cached["files"], cached["dirs"], {}
+
+    files = []
+    dirs = []
+    file_entries = {}
+    with os.scandir(path) as entries:
+        for entry in entries:
+            # is_dir/is_file come from the DirEntry cache, no extra stat per entry
+            if entry.is_dir():
+                dirs.append(entry.name)
+            elif entry.is_file():
+                files.append(entry.name)
+                file_entries[entry.name] = entry
+    files.sort()
+    dirs.sort()
+    if now - mtime > RACY_WINDOW_NS:
+        snapshot[relative_dir] = {"mtime": mtime, "files": files, "dirs": dirs}
+    else:
+        snapshot.pop(relative_dir, None)
+    return files, dirs, file_entries
+
+
+def discover_pages(content_dir, include=DEFAULT_INCLUDE, exclude=(), snapshot=None):
+    # snapshot maps relative directory -> {"mtime", "files", "dirs"} and is updated in place
+    if snapshot is None:
+        snapshot = {}
+    now = time.time_ns()
+    pages = []
+    seen = set()
+    pending = [""]
+    while pending:
+        relative_dir = pending.pop()
+        seen.add(relative_dir)
+        path = os.path.join(content_dir, relative_dir) if relative_dir else content_dir
+        files, dirs, file_entries = list_directory(path, relative_dir, snapshot, now)
+
+        for name in files:
+            relative_path = f"{relative_dir}/{name}" if relative_dir else name
+            if not matches(relative_path, include) or matches(relative_path, exclude):
+                continue
+            # the listing may come from the snapshot but edits don't touch the
+            # directory mtime, so sizes and mtimes are always read fresh: from
+            # the scan's DirEntry when there was one (free on Windows), else a stat
+            entry = file_entries.get(name)
+            stat = entry.stat() if entry is not None else os.stat(os.path.join(path, name))
+            pages.append(Page(relative_path, stat.st_size, stat.st_mtime_ns))
+
+        for name in reversed(dirs):
+            relative_path = f"{relative_dir}/{name}" if relative_dir else name
+            if not matches(relative_path, exclude):
+                pending.append(relative_path)
+
+    # forget directories that no longer exist or are now excluded
+    for relative_dir in list(snapshot):
+        if relative_dir not in seen:
+            del snapshot[relative_dir]
+
+    pages.sort(key=lambda page: page.relative_path)
+    return pages
@@ -0,0 +1,317 @@
+import io
+from array import array
+from htmlnode import HTMLNode, LeafNode, ParentNode, RawNode, escape_attribute, escape_value
+from markdownblock import BlockType, block_to_html_node, footnotes_to_html_node, iter_lines, scan_blocks
+from definitions import Definitions
+from inlinemarkdown import tokenize_inline
+from textnode import TextType
+from template import basepath_url
+
+# the tag of each inline span type that is a plain element around its text
+INLINE_TAGS = {
+    TextType.BOLD: "b",
+    TextType.ITALIC: "i",
+    TextType.CODE: "code",
+}
+
+# node kinds, the ones that render as a slice of text come first; VALUE is
+# text that was its element's value rather than a child of its own
+TEXT = 0
+VALUE = 1
+RAW = 2
+ELEMENT = 3
+VOID = 4
+
+
+class FlatDocument:
+    # a document as parallel arrays, one entry per node in document order:
+    # kind, opening tag id, where its text starts in self.text (it ends where
+    # the next node's starts) and how many elements close right before it,
+    # which is all it takes to find each node's parent. Text is stored
+    # escaped and opening tags are rendered once, so rendering is slicing and
+    # lookups. It holds a page in about half the memory of the HTMLNode tree,
+    # but build and render together take about as long as the tree's
+    def __init__(self):
+        self.kinds = array("B")
+        self.opening_ids = array("I")
+        self.openings = []
+        # opening tag id -> tag id, for the closing tag
+        self.opening_tags = []
+        self.opening_index = {}
+        self.plain_ids = {}
+        self.prop_ids = {}
+        self.starts = array("q")
+        self.closes = array("H")
+        # the chain of open elements up to the last node appended
+        self.open_elements = []
+        # props are rare, so they live in a dict keyed by node index
+        self.props = {}
+        # escaping can't be undone (& and &amp; both become &amp;), so text
+        # that escaping changed keeps its original here, keyed by node index
+        self.raw = {}
+        self.tags = []
+        self.tag_index = {}
+        self.text = ""
+        self.pieces = []
+        self.length = 0
+
+    def tag_id(self, tag):
+        tag_id = self.tag_index.get(tag)
+        if tag_id is None:
+            tag_id = self.tag_index[tag] = len(self.tags)
+            self.tags.append(tag)
+        return tag_id
+
+    def opening_id(self, tag, props):
+        # identical opening tags, props included, are rendered and stored once;
+        # the same tag and props are only escaped and formatted the first time
+        if props:
+            key = (tag, *props.items())
+            opening_id = self.prop_ids.get(key)
+            if opening_id is None:
+                opening_id = self.prop_ids[key] = self.format_opening(tag, props)
+            return opening_id
+        return self.format_opening(tag, props)
+
+    def format_opening(self, tag, props):
+        if props:
+            props_html = "".join(f' {key}="{escape_attribute(value)}"' for key, value in props.items())
+            opening = f"<{tag}{props_html}>"
+        else:
+            opening = f"<{tag}>"
+        opening_id = self.opening_index.get(opening)
+        if opening_id is None:
+            opening_id = self.opening_index[opening] = len(self.openings)
+            self.openings.append(opening)
+            self.opening_tags.append(self.tag_id(tag))
+        return opening_id
+
+    def append(self, kind, parent, tag=None, text="", props=None):
+        # nodes must come in document order: parent is open, or -1 for a root
+        index = len(self.kinds)
+        open_elements = self.open_elements
+        closes = 0
+        while open_elements and open_elements[-1] != parent:
+            open_elements.pop()
+            closes += 1
+        if tag is None:
+            opening_id = 0
+        elif props:
+            opening_id = self.opening_id(tag, props)
+            self.props[index] = props
+        else:
+            # most elements have no props, their opening tag is looked up by tag alone
+            opening_id = self.plain_ids.get(tag)
+            if opening_id is None:
+                opening_id = self.plain_ids[tag] = self.opening_id(tag, None)
+        if kind == ELEMENT:
+            open_elements.append(index)
+        self.kinds.append(kind)
+        self.opening_ids.append(opening_id)
+        self.starts.append(self.length)
+        self.closes.append(closes)
+        if text:
+            self.pieces.append(text)
+            self.length += len(text)
+        return index
+
+    def append_text(self, parent, text, tag=None):
+        # text is unescaped; with tag it is that element's value and escaped as its content.
+        # The same as append(TEXT or VALUE, parent, text=...), spelled out since text is
+        # most of the nodes
+        index = len(self.kinds)
+        open_elements = self.open_elements
+        closes = 0
+        while open_elements and open_elements[-1] != parent:
+            open_elements.pop()
+            closes += 1
+        escaped = escape_value(text, tag)
+        self.kinds.append(TEXT if tag is None else VALUE)
+        self.opening_ids.append(0)
+        self.starts.append(self.length)
+        self.closes.append(closes)
+        if escaped:
+            self.pieces.append(escaped)
+            self.length += len(escaped)
+        if escaped != text:
+            self.raw[index] = text
+        return index
+
+    def finish(self):
+        # join the text pieces once building is done
+        if self.pieces:
+            self.text += "".join(self.pieces)
+            self.pieces = []
+        return self
+
+    def append_html_node(self, node, parent=-1):
+        # add node and its subtree under parent, without recursion
+        pending = [(node, parent)]
+        while pending:
+            node, parent = pending.pop()
+            if isinstance(node, RawNode):
+                self.append(RAW, parent, text=node.value)
+            elif isinstance(node, LeafNode) and node.value is None:
+                raise ValueError("No value given")
+            elif node.tag is None:
+                self.append_text(parent, node.value or "")
+            elif isinstance(node, LeafNode):
+                index = self.append(ELEMENT, parent, node.tag, props=node.props)
+                self.append_text(index, node.value, node.tag)
+            elif node.value == "" and not isinstance(node, ParentNode):
+                self.append(VOID, parent, node.tag, props=node.props)
+            elif node.value is not None and not isinstance(node, ParentNode):
+                index = self.append(ELEMENT, parent, node.tag, props=node.props)
+                self.append_text(index, node.value, node.tag)
+            else:
+                if node.children is None or (not node.children and not isinstance(node, ParentNode)):
+                    raise ValueError("HTMLNode with tag but no content")
+                index = self.append(ELEMENT, parent, node.tag, props=node.props)
+                # reversed, so the stack hands the children back in order
+                for child in reversed(node.children):
+                    pending.append((child, index))
+        return self
+
+    def append_text_node(self, text_node, parent, basepath="/"):
+        # the flat form of text_node_to_html_node(text_node, basepath), without making the node
+        text_type = text_node.text_type
+        if text_type == TextType.TEXT:
+            self.append_text(parent, text_node.text)
+        elif text_type == TextType.IMAGE:
+            self.append(VOID, parent, "img", props={"src": basepath_url(text_node.url, basepath), "alt": text_node.text})
+        elif text_type == TextType.FOOTNOTE:
+            sup = self.append(ELEMENT, parent, "sup", props={"id": text_node.anchor})
+            link = self.append(ELEMENT, sup, "a", props={"href": text_node.url})
+            self.append_text(link, text_node.text, "a")
+        else:
+            tag = INLINE_TAGS.get(text_type, "a")
+            props = {"href": basepath_url(text_node.url, basepath)} if text_type == TextType.LINK else None
+            if text_node.text == "":
+                # an HTMLNode with an empty value renders as a bare opening tag
+                self.append(VOID, parent, tag, props=props)
+            else:
+                index = self.append(ELEMENT, parent, tag, props=props)
+                self.append_text(index, text_node.text, tag)
+
+    def node_text(self, index):
+        end = self.starts[index + 1] if index + 1 < len(self.starts) else self.length
+        return self.text[self.starts[index]:end]
+
+    def tag(self, index):
+        return self.tags[self.opening_tags[self.opening_ids[index]]]
+
+    def parents(self):
+        # each node's parent index, -1 for a root, replayed from the closes
+        parents = []
+        open_elements = []
+        for index, kind in enumerate(self.kinds):
+            for _ in range(self.closes[index]):
+                open_elements.pop()
+            parents.append(open_elements[-1] if open_elements else -1)
+            if kind == ELEMENT:
+                open_elements.append(index)
+        return parents
+
+    def raw_text(self, index):
+        # the text of a TEXT or VALUE node as it was before escaping
+        text = self.raw.get(index)
+        if text is None:
+            text = self.node_text(index)
+        return text
+
+    def to_html_node(self):
+        # the equivalent HTMLNode tree, for code that wants objects
+        self.finish()
+        nodes = []
+        roots = []
+        parents = self.parents()
+        for index, kind in enumerate(self.kinds):
+            parent = parents[index]
+            if kind == VALUE:
+                element = nodes[parent]
+                element.value = self.raw_text(index)
+                element.children = None
+                nodes.append(None)
+                continue
+            tag = self.tag(index) if kind in (ELEMENT, VOID) else None
+            props = self.props.get(index)
+            if kind == ELEMENT:
+                node = HTMLNode(tag, None, [], props)
+            elif kind == VOID:
+                node = HTMLNode(tag, "", None, props)
+            elif kind == RAW:
+                node = RawNode(self.node_text(index))
+            else:
+                node = LeafNode(None, self.raw_text(index))
+            nodes.append(node)
+            if parent == -1:
+                roots.append(node)
+            else:
+                nodes[parent].children.append(node)
+        if len(roots) != 1:
+            raise ValueError(f"a flat document with {len(roots)} roots is not one tree")
+        return roots[0]
+
+    def write_html(self, out):
+        # one loop over the arrays, no parent lookups: closes says when to end elements
+        self.finish()
+        text = self.text
+        write = out.write
+        openings = self.openings
+        # opening tag id -> its closing tag
+        closings = [f"</{self.tags[tag_id]}>" for tag_id in self.opening_tags]
+        open_tags = []
+        ends = self.starts[1:]
+        ends.append(self.length)
+        nodes = zip(self.kinds, self.opening_ids, self.starts, ends, self.closes)
+        for kind, opening_id, start, end, closes in nodes:
+            if closes:
+                for _ in range(closes):
+                    write(closings[open_tags.pop()])
+            if kind < ELEMENT:
+                write(text[start:end])
+            else:
+                write(openings[opening_id])
+                if kind == ELEMENT:
+                    open_tags.append(opening_id)
+        while open_tags:
+            write(closings[open_tags.pop()])
+
+    def to_html(self):
+        out = io.StringIO()
+        self.write_html(out)
+        return out.getvalue()
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __repr__(self):
+        return f"FlatDocument({len(self)} nodes, {len(self.tags)} tags, {self.length} chars of text)"
+
+
+def flat_document_from_html_node(node):
+    return FlatDocument().append_html_node(node).finish()
+
+
+def markdown_to_flat_document(markdown, basepath="/", transforms=None):
+    # same document as markdown_to_html_node, but each block's nodes are
+    # flattened as soon as they are built, so no tree outlives its block
+    if isinstance(markdown, str):
+        markdown = iter_lines(markdown)
+    definitions = Definitions()
+    blocks = list(scan_blocks(markdown, definitions))
+    if transforms:
+        transforms.start_page()
+    document = FlatDocument()
+    root = document.append(ELEMENT, -1, "div")
+    for block_type, lines in blocks:
+        if block_type == BlockType.PARAGRAPH and not transforms:
+            # paragraphs are most of a document, so their spans go straight into the arrays
+            paragraph = document.append(ELEMENT, root, "p")
+            for text_node in tokenize_inline(" ".join(line.strip() for line in lines), definitions):
+                document.append_text_node(text_node, paragraph, basepath)
+        else:
+            document.append_html_node(block_to_html_node(block_type, lines, definitions, basepath, transforms), root)
+    if definitions.footnotes:
+        document.append_html_node(footnotes_to_html_node(definitions, basepath, transforms), root)
+    return document.finish()
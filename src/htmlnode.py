@@ -1,4 +1,39 @@
+import io, re
+
+TEXT_SPECIAL_PATTERN = re.compile(r"[&<>]")
+ATTRIBUTE_SPECIAL_PATTERN = re.compile(r'[&<>"]')
+# an & that doesn't already start an entity such as &amp; or &#8212;
+BARE_AMPERSAND_PATTERN = re.compile(r"&(?!#?\w+;)")
+
+def escape_html(text):
+    # most text has nothing to escape, so look once before copying anything
+    if TEXT_SPECIAL_PATTERN.search(text) is None:
+        return text
+    if "&" in text:
+        text = BARE_AMPERSAND_PATTERN.sub("&amp;", text)
+    return text.replace("<", "&lt;").replace(">", "&gt;")
+
+def escape_code(text):
+    # code shows its text exactly as written, so every & is escaped, entities included
+    if TEXT_SPECIAL_PATTERN.search(text) is None:
+        return text
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+def escape_value(text, tag):
+    # the escaping for the text of an element with this tag
+    if tag == "code":
+        return escape_code(text)
+    return escape_html(text)
+
+def escape_attribute(value):
+    if ATTRIBUTE_SPECIAL_PATTERN.search(value) is None:
+        return value
+    return escape_html(value).replace('"', "&quot;")
+
 class HTMLNode:
+    # slots instead of a per-instance __dict__, every inline span becomes a node
+    __slots__ = ("tag", "value", "children", "props")
+
     def __init__(self, tag=None, value=None, children=None, props=None):
         self.tag = tag
         self.value = value
@@ -6,97 +41,104 @@ class HTMLNode:
         self.props = props
 
     def to_html(self):
-        if self.tag is None:
-            return self.value or ""
-        
-        img_props = ""
-        if self.value == "":
-            if self.props is not None:
-                for key, value in self.props.items():
-                    img_props += f' {key}="{value}"'
-            return f"<{self.tag}{img_props}>"
+        # one traversal into a single buffer; write_html does the work
+        out = io.StringIO()
+        self.write_html(out)
+        return out.getvalue()
+
+    def write_html(self, out):
+        # out is anything with a write(str) method, e.g. an open file or io.StringIO
+        tag = self.tag
+        value = self.value
+        if tag is None:
+            out.write(escape_html(value or ""))
+            return
+
+        props = self.props_to_html() if self.props else ""
+        if value == "":
+            out.write(f"<{tag}{props}>")
+            return
+
+        # a leaf goes out in a single write, most nodes in a page are leaves
+        if value is not None:
+            out.write(f"<{tag}{props}>{escape_value(value, tag)}</{tag}>")
+            return
 
-    
         # If tag is provided, we need either value or children
-        if self.value is None and (self.children is None or len(self.children) == 0):
+        if not self.children:
             raise ValueError("HTMLNode with tag but no content")
-    
-        # Build props string
-        props_str = ""
+
+        out.write(f"<{tag}{props}>")
+        for child in self.children:
+            child.write_html(out)
+        out.write(f"</{tag}>")
+
+    def write_props(self, out):
         if self.props:
-            for key, value in self.props.items():
-                props_str += f' {key}="{value}"'
-    
-        # Build children HTML
-        children_html = ""
-        if self.children:
-            for child in self.children:
-                children_html += child.to_html()
-    
-        # If we have value, use it as content
-        if self.value is not None:
-            return f"<{self.tag}{props_str}>{self.value}</{self.tag}>"
-    
-        # Otherwise use children as content
-        return f"<{self.tag}{props_str}>{children_html}</{self.tag}>"
-    
+            out.write(self.props_to_html())
+
     def props_to_html(self):
         if not self.props:
             return ""
-        
         result = ""
-
         for key, value in self.props.items():
-            result += f' {key}="{value}"'
-
+            result += f' {key}="{escape_attribute(value)}"'
         return result
     
     def __repr__(self):
         return f"HTMLNode({self.tag}, {self.value}, children: {self.children}, {self.props})"
     
 class LeafNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, value, props=None):
         super().__init__(tag, value, None, props)
         
-    def to_html(self):
+    def write_html(self, out):
         if self.value is None:
             raise ValueError("No value given")
         
         if self.tag is None:
-            return self.value
-        
-        if self.props is None:
-            return f"<{self.tag}>{self.value}</{self.tag}>"
-        
-        props_html = self.props_to_html()
+            out.write(escape_html(self.value))
+            return
 
-        result = f"<{self.tag}{props_html}>{self.value}</{self.tag}>"
-
-        return result
+        props = self.props_to_html() if self.props else ""
+        out.write(f"<{self.tag}{props}>{escape_value(self.value, self.tag)}</{self.tag}>")
 
     def __repr__(self):
         return f"LeafNode({self.tag}, {self.value}, {self.props})"
     
+class RawNode(HTMLNode):
+    # html that is already rendered and escaped, e.g. a fragment from the block cache
+    __slots__ = ()
+
+    def __init__(self, html):
+        super().__init__(None, html)
+
+    def write_html(self, out):
+        out.write(self.value)
+
+    def __repr__(self):
+        return f"RawNode({self.value})"
+
 class ParentNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, children, props=None):
         super().__init__(tag, None, children, props)
 
-    def to_html(self):
+    def write_html(self, out):
         if self.tag is None:
             raise ValueError("tag missing")
         
         if self.children is None:
             raise ValueError("children missing")
-        
-        children_html = [child.to_html() for child in self.children]
 
-        children_content = "".join(children_html)
-
-        if self.props is None:
-            return f"<{self.tag}>{children_content}</{self.tag}>"
-            
-        return f"<{self.tag}{self.props_to_html()}>{children_content}</{self.tag}>"
+        props = self.props_to_html() if self.props else ""
+        out.write(f"<{self.tag}{props}>")
+        for child in self.children:
+            child.write_html(out)
+        out.write(f"</{self.tag}>")
     
     def __repr__(self):
         return f"ParentNode({self.tag}, children: {self.children}, {self.props})"
-
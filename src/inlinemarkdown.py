@@ -1,8 +1,28 @@
 import re
-from htmlnode import HTMLNode
+from htmlnode import HTMLNode, escape_attribute, escape_code, escape_html
 from textnode import TextNode, TextType
-
-def text_node_to_html_node(text_node):
+from template import basepath_url
+
+IMAGE_PATTERN = re.compile(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)")
+LINK_PATTERN = re.compile(r"\[([^\[\]]*)\]\(([^\(\)]*)\)")
+LINK_ONLY_PATTERN = re.compile(r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)")
+REFERENCE_PATTERN = re.compile(r"\[([^\[\]]*)\](?:\[([^\[\]]*)\])?")
+FOOTNOTE_REFERENCE_PATTERN = re.compile(r"\[\^([^\[\]\s]+)\]")
+INLINE_TOKEN_PATTERN = re.compile(r"!\[|\[|\*\*|_|`")
+DELIMITER_TYPES = {
+    "**": TextType.BOLD,
+    "_": TextType.ITALIC,
+    "`": TextType.CODE,
+}
+
+def text_node_to_html_node(text_node, basepath="/", transforms=None):
+    # root-relative link and image urls get the basepath here, as their props are made
+    node = inline_html_node(text_node, basepath)
+    if transforms:
+        transforms.apply(node)
+    return node
+
+def inline_html_node(text_node, basepath):
     match (text_node.text_type):
         case (TextType.TEXT):
             return HTMLNode(None, text_node.text)
@@ -13,12 +33,47 @@ def text_node_to_html_node(text_node):
         case (TextType.CODE):
             return HTMLNode("code", text_node.text)
         case (TextType.LINK):
-            return HTMLNode("a", text_node.text, None, {"href": text_node.url})
+            return HTMLNode("a", text_node.text, None, {"href": basepath_url(text_node.url, basepath)})
+        case (TextType.IMAGE):
+            return HTMLNode("img", "", None, {"src": basepath_url(text_node.url, basepath), "alt": text_node.text})
+        case (TextType.FOOTNOTE):
+            # text is the footnote's number, url points at its entry at the end of the page
+            link = HTMLNode("a", text_node.text, None, {"href": text_node.url})
+            return HTMLNode("sup", None, [link], {"id": text_node.anchor})
+        case _:
+            raise ValueError(f"Invalid text type: {text_node.text_type}")
+
+def text_node_to_html(text_node, basepath="/"):
+    # same string as text_node_to_html_node(text_node).to_html(), without building the node
+    text = escape_html(text_node.text)
+    match (text_node.text_type):
+        case (TextType.TEXT):
+            return text
+        case (TextType.BOLD):
+            return f"<b>{text}</b>"
+        case (TextType.ITALIC):
+            return f"<i>{text}</i>"
+        case (TextType.CODE):
+            return f"<code>{escape_code(text_node.text)}</code>"
+        case (TextType.LINK):
+            return f'<a href="{escape_attribute(basepath_url(text_node.url, basepath))}">{text}</a>'
         case (TextType.IMAGE):
-            return HTMLNode("img", "", None, {"src": text_node.url, "alt": text_node.text})
+            return f'<img src="{escape_attribute(basepath_url(text_node.url, basepath))}" alt="{escape_attribute(text_node.text)}">'
+        case (TextType.FOOTNOTE):
+            return f'<sup id="{text_node.anchor}"><a href="{text_node.url}">{text}</a></sup>'
         case _:
             raise ValueError(f"Invalid text type: {text_node.text_type}")
 
+def text_to_html(text, definitions=None, basepath="/", transforms=None):
+    # inline markdown straight to a string, for places that render many small texts
+    if INLINE_TOKEN_PATTERN.search(text) is None:
+        return escape_html(text)
+    if transforms:
+        # transforms work on nodes, so the spans are built after all
+        nodes = tokenize_inline(text, definitions)
+        return "".join(text_node_to_html_node(node, basepath, transforms).to_html() for node in nodes)
+    return "".join(text_node_to_html(node, basepath) for node in tokenize_inline(text, definitions))
+
 def split_nodes_delimiter(old_nodes, delimiter, text_type):
     new_nodes = []
     for old_node in old_nodes:
@@ -31,7 +86,8 @@ def split_nodes_delimiter(old_nodes, delimiter, text_type):
         split_nodes = []
         sections = old_node.text.split(delimiter)
         if len(sections) % 2 == 0:
-            raise ValueError("invlaid markdown, formatted section not closed")
+            # the last delimiter is never closed, keep it as plain text
+            sections[-2:] = [sections[-2] + delimiter + sections[-1]]
         for i in range(len(sections)):
             if sections[i] == "":
                 continue
@@ -42,6 +98,19 @@ def split_nodes_delimiter(old_nodes, delimiter, text_type):
         new_nodes.extend(split_nodes)
     return new_nodes
         
+def split_text_on_pattern(text, pattern, text_type):
+    # one finditer pass with slices, instead of re-splitting the rest of the text per match
+    nodes = []
+    text_start = 0
+    for match in pattern.finditer(text):
+        if match.start() > text_start:
+            nodes.append(TextNode(text[text_start:match.start()], TextType.TEXT))
+        nodes.append(TextNode(match.group(1), text_type, match.group(2)))
+        text_start = match.end()
+    if text_start < len(text):
+        nodes.append(TextNode(text[text_start:], TextType.TEXT))
+    return nodes
+
 def split_nodes_image(old_nodes):
     new_nodes = []
     for old_node in old_nodes:
@@ -49,41 +118,7 @@ def split_nodes_image(old_nodes):
         if old_node.text_type != TextType.TEXT:
             new_nodes.append(old_node)
             continue
-        
-        # extract images
-        images = extract_markdown_images(old_node.text)
-
-        if not images:
-            new_nodes.append(old_node)
-            continue
-        
-        # process images
-        current_text = old_node.text
-        current_nodes = []
-
-        for alt_text, url in images:
-            # split around image markdown
-            image_markdown = f"![{alt_text}]({url})"
-            parts = current_text.split(image_markdown, 1)
-
-            # add text before image if not empty
-            if parts[0]:
-                current_nodes.append(TextNode(parts[0], TextType.TEXT))
-
-            # add image node
-            current_nodes.append(TextNode(alt_text, TextType.IMAGE, url))
-
-            # update current_text to remaining text
-            if len(parts) > 1:
-                current_text = parts[1]
-            else:
-                current_text = ""
-
-        # add any remaining text
-        if current_text:
-            current_nodes.append(TextNode(current_text, TextType.TEXT))
-
-        new_nodes.extend(current_nodes)
+        new_nodes.extend(split_text_on_pattern(old_node.text, IMAGE_PATTERN, TextType.IMAGE))
     return new_nodes
 
 def split_nodes_link(old_nodes):
@@ -92,58 +127,106 @@ def split_nodes_link(old_nodes):
         if old_node.text_type != TextType.TEXT:
             new_nodes.append(old_node)
             continue
+        new_nodes.extend(split_text_on_pattern(old_node.text, LINK_ONLY_PATTERN, TextType.LINK))
+    return new_nodes
 
-        # extract links
-        links = extract_markdown_links(old_node.text)
-
-        if not links:
-            new_nodes.append(old_node)
-            continue
-
-        current_text = old_node.text
-        current_nodes = []
-
-        for anchor_text, url in links:
-            link_markdown = f"[{anchor_text}]({url})"
-            parts = current_text.split(link_markdown, 1)
-
-            # add text
-            if parts[0]:
-                current_nodes.append(TextNode(parts[0], TextType.TEXT))
-
-            # add link node
-            current_nodes.append(TextNode(anchor_text, TextType.LINK, url))
-
-            # update current_text to remaining text
-            if len(parts) > 1:
-                current_text = parts[1]
+def find_closing_delimiter(text, delimiter, start, exhausted):
+    # exhausted maps a delimiter to a position with no closer anywhere after it,
+    # so a line full of unmatched delimiters is still only scanned once
+    if start >= exhausted.get(delimiter, len(text) + 1):
+        return -1
+    end = text.find(delimiter, start)
+    while end != -1:
+        # an underscore followed by a letter or digit is inside a word, not a closer
+        if delimiter != "_" or end + 1 >= len(text) or not text[end + 1].isalnum():
+            return end
+        end = text.find(delimiter, end + 1)
+    exhausted[delimiter] = start
+    return -1
+
+def match_reference(text, start, token, definitions):
+    # [^note], [text][label], [text][] or [text], resolved with a single lookup
+    # in the document's definitions; returns (TextNode, end) or None
+    if token == "[":
+        footnote = FOOTNOTE_REFERENCE_PATTERN.match(text, start)
+        if footnote is not None:
+            entry = definitions.footnote_reference(footnote.group(1))
+            if entry is None:
+                return None
+            number, anchor = entry
+            return TextNode(str(number), TextType.FOOTNOTE, f"#fn-{number}", anchor), footnote.end()
+
+    found = REFERENCE_PATTERN.match(text, start + len(token) - 1)
+    if found is None:
+        return None
+    url = definitions.link(found.group(2) or found.group(1))
+    if url is None:
+        return None
+    text_type = TextType.IMAGE if token == "![" else TextType.LINK
+    return TextNode(found.group(1), text_type, url), found.end()
+
+def tokenize_inline(text, definitions=None):
+    # one left-to-right pass: jump from one possible token start to the next,
+    # everything in between is plain text
+    nodes = []
+    text_start = 0
+    i = 0
+    exhausted = {}
+    while True:
+        match = INLINE_TOKEN_PATTERN.search(text, i)
+        if match is None:
+            break
+        start = match.start()
+        token = match.group()
+
+        if token == "![" or token == "[":
+            pattern = IMAGE_PATTERN if token == "![" else LINK_PATTERN
+            found = pattern.match(text, start)
+            if found is not None:
+                text_type = TextType.IMAGE if token == "![" else TextType.LINK
+                node, end = TextNode(found.group(1), text_type, found.group(2)), found.end()
+            elif definitions:
+                reference = match_reference(text, start, token, definitions)
+                if reference is None:
+                    i = start + len(token)
+                    continue
+                node, end = reference
             else:
-                current_text = ""
-
-            # add remaining text
-        if current_text:
-            current_nodes.append(TextNode(current_text, TextType.TEXT))
+                # not an image or link after all, keep scanning after the bracket
+                i = start + len(token)
+                continue
+            if start > text_start:
+                nodes.append(TextNode(text[text_start:start], TextType.TEXT))
+            nodes.append(node)
+            text_start = i = end
+            continue
 
-        new_nodes.extend(current_nodes)
-    return new_nodes 
+        if token == "_" and start > 0 and text[start - 1].isalnum():
+            # snake_case: an underscore inside a word never opens emphasis
+            i = start + 1
+            continue
+        end = find_closing_delimiter(text, token, start + len(token), exhausted)
+        if end == -1:
+            # never closed, so the delimiter is just text
+            i = start + len(token)
+            continue
+        if start > text_start:
+            nodes.append(TextNode(text[text_start:start], TextType.TEXT))
+        inner = text[start + len(token):end]
+        if inner:
+            nodes.append(TextNode(inner, DELIMITER_TYPES[token]))
+        text_start = i = end + len(token)
+
+    if text_start < len(text):
+        nodes.append(TextNode(text[text_start:], TextType.TEXT))
+    return nodes
 
-def text_to_textnodes(text):
+def text_to_textnodes(text, definitions=None):
     # special case for empty string
     if text == "":
         return [TextNode("", TextType.TEXT)]
-    
-    nodes = [TextNode(text, TextType.TEXT)]
-    # process images
-    nodes = split_nodes_image(nodes)
-    # process links
-    nodes = split_nodes_link(nodes)
 
-    # process other delimiters
-    nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
-    nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
-    nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
-
-    return nodes
+    return tokenize_inline(text, definitions)
 
 
 
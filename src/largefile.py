@@ -0,0 +1,75 @@
+import filecmp, mmap, os
+from markdownblock import BlockType, block_to_html_node, footnotes_to_html_node, render_block, scan_blocks, table_to_html_parts
+from definitions import Definitions
+from htmlnode import escape_html
+from dependencies import referenced_images
+
+# sources at least this big are streamed from a memory map instead of read whole
+LARGE_FILE_THRESHOLD = 64 << 20
+WRITE_BUFFER = 1 << 20
+# bigger blocks skip the block cache, which would hold their html as one string
+CACHED_BLOCK_LIMIT = 1 << 20
+
+
+def iter_mmap_lines(mapped):
+    # decode one line at a time, so only the current line is ever a Python string
+    start = 0
+    size = len(mapped)
+    while start < size:
+        end = mapped.find(b"\n", start)
+        if end == -1:
+            end = size
+        yield mapped[start:end].decode("utf-8")
+        start = end + 1
+
+
+def extract_title_from_lines(lines):
+    for line in lines:
+        if line.startswith("# "):
+            return line[2:].strip()
+    raise Exception("No title")
+
+
+def render_large_page(source_path, dest_path, template, cache=None, transforms=None):
+    # returns (written, image urls) like render_page_to_file, holding one block at a time
+    tmp_path = f"{dest_path}.tmp{os.getpid()}"
+    image_urls = []
+
+    with open(source_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        title = extract_title_from_lines(iter_mmap_lines(mapped))
+        # a first pass collects the definitions, references may come before them
+        definitions = Definitions()
+        for block in scan_blocks(iter_mmap_lines(mapped), definitions):
+            pass
+
+        def content():
+            if transforms:
+                transforms.start_page()
+            yield "<div>"
+            for block_type, lines in scan_blocks(iter_mmap_lines(mapped), definitions):
+                if block_type == BlockType.TABLE:
+                    # tables go out a row at a time and are never cached, however big
+                    for line in lines:
+                        image_urls.extend(referenced_images(line))
+                    yield from table_to_html_parts(lines, definitions, template.basepath, transforms)
+                    continue
+                image_urls.extend(referenced_images("\n".join(lines)))
+                if cache is None or sum(len(line) + 1 for line in lines) > CACHED_BLOCK_LIMIT:
+                    yield block_to_html_node(block_type, lines, definitions, template.basepath, transforms).to_html()
+                else:
+                    yield render_block(block_type, lines, cache, definitions, template.basepath, transforms)
+            if definitions.footnotes:
+                yield footnotes_to_html_node(definitions, template.basepath, transforms).to_html()
+            # the definitions may point at images too
+            image_urls.extend(definitions.links.values())
+            yield "</div>"
+
+        with open(tmp_path, "w", encoding="utf-8", buffering=WRITE_BUFFER) as out:
+            template.render_to(out, Title=escape_html(title), Content=content())
+
+    # same rule as write_file_if_changed: identical output leaves the old file alone
+    if os.path.exists(dest_path) and filecmp.cmp(tmp_path, dest_path, shallow=False):
+        os.remove(tmp_path)
+        return False, image_urls
+    os.replace(tmp_path, dest_path)
+    return True, image_urls
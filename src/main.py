@@ -1,26 +1,21 @@
-from textnode import TextNode, TextType
-from htmlnode import LeafNode, HTMLNode
-from markdownblock import markdown_to_html_node
-import os, shutil, sys
+from htmlnode import escape_html
+from markdownblock import markdown_to_html
+from manifest import empty_manifest, hash_file, load_manifest, save_manifest
+from template import load_template
+from assets import prune_empty_dirs, remove_stale_files, scan_static, sync_static
+from publish import prepare_staging, publish, write_file_if_changed
+from dependencies import dependencies_changed, page_dependencies, referenced_images
+from discovery import DEFAULT_INCLUDE, discover_pages
+from blockcache import DEFAULT_MAX_BYTES, RENDER_VERSION, BlockCache
+from transforms import BUILTIN_TRANSFORMS, Transforms, load_transform
+from largefile import LARGE_FILE_THRESHOLD, render_large_page
+from shard import load_shard_manifests, merge_shards, page_shard, parse_shard, shard_manifest_path, shard_output_dir
+from concurrent.futures import ProcessPoolExecutor
+import argparse, os, sys
 
-
-def copy_content(source, destination):
-    if os.path.exists(destination):
-        shutil.rmtree(destination)
-
-    os.mkdir(destination)
-
-    items = os.listdir(source)
-    for item in items:
-        source_path = os.path.join(source, item)
-        destination_path = os.path.join(destination, item)
-        if os.path.isfile(source_path):
-            shutil.copy(source_path, destination_path)
-            print(f"Copying file: {source_path}")
-        else:
-            os.mkdir(destination_path)
-            copy_content(source_path, destination_path)
-            print(f"Creating directory: {destination_path}")
+MANIFEST_PATH = os.path.join(".build", "manifest.json")
+SHARD_DIR = os.path.join(".build", "shards")
+BLOCK_CACHE_PATH = os.path.join(".build", "blocks.sqlite")
 
 
 def extract_title(markdown):
@@ -32,71 +27,336 @@ def extract_title(markdown):
             return strip_title
     raise Exception("No title")
 
-def generate_page(from_path, template_path, dest_path, basepath):
-    print(f"Generating page from {from_path} to {dest_path} using {template_path}")
-    with open(from_path, "r") as f:
-        from_read = f.read()
-    with open(template_path, "r") as f:
-        template_read = f.read()
-    markdown_conversion = markdown_to_html_node(from_read).to_html()
-    title = extract_title(from_read)
-    replace_title = template_read.replace("{{ Title }}", title)
-    replace_content = replace_title.replace("{{ Content }}", markdown_conversion)
-    replace_content = replace_content.replace('href="/', f'href="{basepath}')
-    replace_content = replace_content.replace('src="/', f'src="{basepath}')
+def render_page(markdown, template, block_jobs=1, cache=None, transforms=None):
+    # template is a compiled Template whose own links already carry the basepath,
+    # the content's links get it as they are rendered
+    markdown_conversion = markdown_to_html(markdown, block_jobs, cache=cache, basepath=template.basepath, transforms=transforms)
+    title = extract_title(markdown)
+    return template.render(Title=escape_html(title), Content=markdown_conversion)
+
+
+def render_page_to_file(source_path, dest_path, template, block_jobs=1, large_file_threshold=LARGE_FILE_THRESHOLD, cache=None, transforms=None):
+    print(f"Generating page from {source_path} to {dest_path}")
+    if os.path.getsize(source_path) >= large_file_threshold:
+        # stream huge sources through a memory map so memory stays bounded
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        return render_large_page(source_path, dest_path, template, cache, transforms)
+    with open(source_path, "r") as f:
+        source_read = f.read()
+    replace_content = render_page(source_read, template, block_jobs, cache, transforms)
     os.makedirs(os.path.dirname(dest_path), exist_ok=True)
-    with open(dest_path, "w") as f:
-        f.write(replace_content)
-
-def copy_public(static, public):
-    if os.path.exists(public):
-        shutil.rmtree(public)
-        if os.path.exists(static):
-            shutil.copytree(static, public)
-
-
-def generate_pages_recursive(dir_path_content, template_path, dest_dir_path, basepath):
-    items = os.listdir(dir_path_content)
-    for item in items:
-        source_path = os.path.join(dir_path_content, item)
-        content_relative_path = source_path[len(dir_path_content):]
-        if content_relative_path.startswith("/"):
-            content_relative_path = content_relative_path[1:]
-        html_relative_path = content_relative_path.replace(".md", ".html")
+    written = write_file_if_changed(dest_path, replace_content)
+    # the images are the page's edges to static/ in the dependency graph
+    return written, referenced_images(source_read)
+
+
+def render_page_in_worker(source_path, dest_path, template, large_file_threshold, cache, transforms):
+    # each worker gets its own copy of the cache and transforms, so their counts travel back with the result
+    try:
+        result = render_page_to_file(source_path, dest_path, template, 1, large_file_threshold, cache, transforms)
+    finally:
+        if cache is not None:
+            cache.close()
+    counts = (0, 0) if cache is None else (cache.hits, cache.misses)
+    timings = transforms.timings() if transforms else None
+    return result, counts, timings
+
+
+def render_pages(pages, template, jobs=1, large_file_threshold=LARGE_FILE_THRESHOLD, cache=None, transforms=None):
+    # pages is a list of (size, source_path, dest_path),
+    # returns source_path -> (written, image urls) for each page
+    if jobs <= 1 or len(pages) <= 1:
+        # with a single page the workers go to its blocks instead, if it is big enough
+        return {
+            source_path: render_page_to_file(source_path, dest_path, template, jobs, large_file_threshold, cache, transforms)
+            for size, source_path, dest_path in pages
+        }
+
+    # biggest pages first so one slow page doesn't finish the build on its own
+    ordered = sorted(pages, key=lambda page: (-page[0], page[1]))
+    if cache is not None:
+        # workers open the cache file themselves, so commit what this process has written
+        cache.flush()
+    results = {}
+    with ProcessPoolExecutor(max_workers=min(jobs, len(ordered))) as executor:
+        futures = {
+            source_path: executor.submit(render_page_in_worker, source_path, dest_path, template, large_file_threshold, cache, transforms)
+            for size, source_path, dest_path in ordered
+        }
+        for source_path, future in futures.items():
+            # result() re-raises the first worker error in the parent
+            results[source_path], (hits, misses), timings = future.result()
+            if cache is not None:
+                cache.hits += hits
+                cache.misses += misses
+            if timings is not None:
+                transforms.add_timings(*timings)
+    return results
+
+
+def remove_output(dest_path, dest_dir_path):
+    if os.path.exists(dest_path):
+        os.remove(dest_path)
+        print(f"Removing page: {dest_path}")
+    prune_empty_dirs(os.path.dirname(dest_path), dest_dir_path)
+
+
+def generate_pages_incremental(dir_path_content, template_path, dest_dir_path, basepath, manifest, jobs=1, shard=None, include=DEFAULT_INCLUDE, exclude=(), large_file_threshold=LARGE_FILE_THRESHOLD, cache=None, transforms=None):
+    template_hash = hash_file(template_path)
+    transforms_fingerprint = transforms.fingerprint() if transforms else ""
+    # a new renderer, template, basepath or set of transforms changes every page
+    rebuild_all = (
+        manifest["renderer"] != RENDER_VERSION
+        or manifest["template"] != template_hash
+        or manifest["basepath"] != basepath
+        or manifest["transforms"] != transforms_fingerprint
+    )
+
+    old_pages = manifest["pages"]
+    assets = manifest["assets"]
+    new_pages = {}
+    dirty_pages = []
+    dirty_paths = {}
+    skipped = 0
+
+    # one scandir walk, reusing the listings of directories that haven't changed
+    pages = discover_pages(dir_path_content, include, exclude, manifest["directories"])
+    for page in pages:
+        content_relative_path = page.relative_path
+        if shard is not None and page_shard(content_relative_path, shard[1]) != shard[0]:
+            continue
+        source_path = os.path.join(dir_path_content, content_relative_path)
+        html_relative_path = page.html_relative_path
         dest_path = os.path.join(dest_dir_path, html_relative_path)
-        if os.path.isfile(source_path) and source_path.endswith(".md"):
-            create_dir = os.path.dirname(dest_path)
-            os.makedirs(create_dir, exist_ok=True)
-            with open(source_path, "r") as f:
-                source_read = f.read()
-            with open(template_path, "r") as f:
-                template_read = f.read()
-            title = extract_title(source_read)
-            markdown_conversion = markdown_to_html_node(source_read).to_html()
-            replace_title = template_read.replace("{{ Title }}", title)
-            replace_content = replace_title.replace("{{ Content }}", markdown_conversion)
-            replace_content = replace_content.replace('href="/', f'href="{basepath}')
-            replace_content = replace_content.replace('src="/', f'src="{basepath}')
-            with open(dest_path, "w") as f:
-                f.write(replace_content)
-        elif os.path.isdir(source_path):
-            os.makedirs(os.path.join(dest_dir_path, item), exist_ok=True)
-            generate_pages_recursive(source_path, template_path, os.path.join(dest_dir_path, item), basepath)
-
-
-def main():
+
+        old_entry = old_pages.get(content_relative_path)
+        # only hash the source when size or mtime say it may have changed
+        if old_entry is not None and old_entry["size"] == page.size and old_entry["mtime"] == page.mtime:
+            source_hash = old_entry["source_hash"]
+        else:
+            source_hash = hash_file(source_path)
+
+        new_entry = {
+            "source_hash": source_hash,
+            "size": page.size,
+            "mtime": page.mtime,
+            "dest": html_relative_path,
+            "dependencies": {},
+        }
+        new_pages[content_relative_path] = new_entry
+
+        # the renderer, template, basepath and transforms are edges of every page, the source and
+        # its images are edges of this page only
+        unchanged = (
+            not rebuild_all
+            and old_entry is not None
+            and old_entry["source_hash"] == source_hash
+            and old_entry["dest"] == html_relative_path
+            and not dependencies_changed(old_entry["dependencies"], assets)
+            and os.path.exists(dest_path)
+        )
+        if unchanged:
+            new_entry["dependencies"] = old_entry["dependencies"]
+            skipped += 1
+            continue
+
+        dirty_pages.append((page.size, source_path, dest_path))
+        dirty_paths[source_path] = content_relative_path
+
+    written = 0
+    if dirty_pages:
+        template = load_template(template_path, basepath)
+        results = render_pages(dirty_pages, template, jobs, large_file_threshold, cache, transforms)
+        for source_path, (page_written, image_urls) in results.items():
+            content_relative_path = dirty_paths[source_path]
+            new_pages[content_relative_path]["dependencies"] = page_dependencies(image_urls, content_relative_path, assets)
+            if page_written:
+                written += 1
+    rendered = len(dirty_pages)
+
+    # drop outputs whose source has gone away
+    removed = 0
+    for content_relative_path, old_entry in old_pages.items():
+        if content_relative_path in new_pages:
+            continue
+        remove_output(os.path.join(dest_dir_path, old_entry["dest"]), dest_dir_path)
+        removed += 1
+
+    manifest["renderer"] = RENDER_VERSION
+    manifest["template"] = template_hash
+    manifest["basepath"] = basepath
+    manifest["transforms"] = transforms_fingerprint
+    manifest["pages"] = new_pages
+    print(f"Pages rendered: {rendered} (written: {written}, identical: {rendered - written}), unchanged: {skipped}, removed: {removed}")
+    return rendered, written, skipped, removed
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Build the site from content/ into docs/")
+    parser.add_argument("basepath", nargs="?", default="/")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="keep docs/, sync only changed static files and re-render only pages whose source, template or basepath changed",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        help="render pages across this many worker processes, or the blocks of one large page (0 means one per CPU)",
+    )
+    parser.add_argument(
+        "--include",
+        action="append",
+        metavar="GLOB",
+        help="content paths to render, relative to content/ (default: *.md, repeatable)",
+    )
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        default=[],
+        metavar="GLOB",
+        help="content paths or directories to skip (repeatable)",
+    )
+    parser.add_argument(
+        "--copy-jobs",
+        type=int,
+        default=8,
+        help="threads used to copy static files",
+    )
+    parser.add_argument(
+        "--link-assets",
+        action="store_true",
+        help="hard-link static files into docs/ instead of copying them when both are on one filesystem",
+    )
+    parser.add_argument(
+        "--large-file-mb",
+        type=int,
+        default=LARGE_FILE_THRESHOLD >> 20,
+        metavar="MB",
+        help="stream sources at least this big from a memory map instead of reading them whole",
+    )
+    parser.add_argument("--block-cache", default=BLOCK_CACHE_PATH, help="where to keep rendered blocks between builds")
+    parser.add_argument(
+        "--block-cache-mb",
+        type=int,
+        default=DEFAULT_MAX_BYTES >> 20,
+        metavar="MB",
+        help="size cap of the block cache, least recently used blocks are evicted past it",
+    )
+    parser.add_argument("--no-block-cache", action="store_true", help="render every block from scratch")
+    parser.add_argument(
+        "--transform",
+        action="append",
+        default=[],
+        metavar="NAME",
+        help=f"change nodes as pages are rendered: {', '.join(BUILTIN_TRANSFORMS)} or module:Class (repeatable)",
+    )
+    parser.add_argument("--manifest", default=MANIFEST_PATH, help="where to keep the build manifest")
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        help="render only shard i of n (e.g. 2/4) into the shard directory",
+    )
+    parser.add_argument(
+        "--merge-shards",
+        type=int,
+        metavar="N",
+        help="combine the output of shards 1..N into docs/",
+    )
+    parser.add_argument("--shard-dir", default=SHARD_DIR, help="where shard builds keep their output")
+    args = parser.parse_args(argv)
     try:
-        basepath = sys.argv[1]
-    except IndexError:
-        basepath = "/"
-    if os.path.exists("docs"):
-        shutil.rmtree("docs")
-    os.mkdir("docs")
-    copy_public("static", "docs")
-    generate_pages_recursive("content", "template.html", "docs", basepath)
-    
+        args.transforms = Transforms(load_transform(spec) for spec in args.transform)
+    except (ValueError, ImportError, AttributeError) as e:
+        parser.error(str(e))
+    if args.shard is not None and args.merge_shards is not None:
+        parser.error("--shard and --merge-shards can't be used together")
+    return args
+
+
+def build_shard(shard, shard_dir, basepath, jobs=1, incremental=False, dir_path_content="content", template_path="template.html", static="static", include=DEFAULT_INCLUDE, exclude=(), large_file_threshold=LARGE_FILE_THRESHOLD, cache=None, transforms=None):
+    index, count = shard
+    manifest_path = shard_manifest_path(shard_dir, index)
+    manifest = load_manifest(manifest_path) if incremental else empty_manifest()
+    output_dir = shard_output_dir(shard_dir, index)
+    os.makedirs(output_dir, exist_ok=True)
 
+    # shards only need the asset fingerprints, the merge step copies static/
+    manifest["assets"] = scan_static(static)
+    manifest["shard"] = [index, count]
+    generate_pages_incremental(dir_path_content, template_path, output_dir, basepath, manifest, jobs, shard, include, exclude, large_file_threshold, cache, transforms)
+    if not incremental:
+        outputs = {page["dest"] for page in manifest["pages"].values()}
+        remove_stale_files(output_dir, outputs)
+    save_manifest(manifest_path, manifest)
+    return manifest
 
 
+def merge_shard_outputs(count, shard_dir, manifest_path, output="docs", static="static", copy_jobs=1, link_assets=False):
+    # check every shard is there before touching the output
+    shard_manifests = load_shard_manifests(shard_dir, count)
+    staging = prepare_staging(output)
+    assets = sync_static(static, staging, load_manifest(manifest_path)["assets"], copy_jobs, link_assets)[0]
+    manifest = merge_shards(shard_manifests, shard_dir, staging)
+    manifest["assets"] = assets
+    outputs = set(assets)
+    outputs.update(page["dest"] for page in manifest["pages"].values())
+    remove_stale_files(staging, outputs)
+    publish(staging, output)
+    # the merged manifest lets a later --incremental build pick up from here
+    save_manifest(manifest_path, manifest)
+    return manifest
+
+
+def build_site(basepath, jobs=1, incremental=False, manifest_path=MANIFEST_PATH, copy_jobs=1, link_assets=False, include=DEFAULT_INCLUDE, exclude=(), large_file_threshold=LARGE_FILE_THRESHOLD, cache=None, transforms=None):
+    if incremental:
+        manifest = load_manifest(manifest_path)
+    else:
+        manifest = empty_manifest()
+
+    # build into a staging copy of docs/ and swap it in at the end,
+    # so docs/ is never empty or half-written while the build runs
+    staging = prepare_staging("docs")
+    manifest["assets"] = sync_static("static", staging, manifest["assets"], copy_jobs, link_assets)[0]
+    generate_pages_incremental("content", "template.html", staging, basepath, manifest, jobs, include=include, exclude=exclude, large_file_threshold=large_file_threshold, cache=cache, transforms=transforms)
+    if not incremental:
+        # a full build has no manifest to diff against, so drop anything it didn't produce
+        outputs = set(manifest["assets"])
+        outputs.update(page["dest"] for page in manifest["pages"].values())
+        remove_stale_files(staging, outputs)
+    publish(staging, "docs")
+    save_manifest(manifest_path, manifest)
+    return manifest
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    basepath = args.basepath
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    include = args.include or DEFAULT_INCLUDE
+    large_file_threshold = args.large_file_mb << 20
+
+    if args.merge_shards is not None:
+        merge_shard_outputs(args.merge_shards, args.shard_dir, args.manifest, copy_jobs=args.copy_jobs, link_assets=args.link_assets)
+        return
+
+    cache = None if args.no_block_cache else BlockCache(args.block_cache, args.block_cache_mb << 20)
+    try:
+        if args.shard is not None:
+            build_shard(args.shard, args.shard_dir, basepath, jobs, args.incremental, include=include, exclude=args.exclude, large_file_threshold=large_file_threshold, cache=cache, transforms=args.transforms)
+        else:
+            build_site(basepath, jobs, args.incremental, args.manifest, args.copy_jobs, args.link_assets, include, args.exclude, large_file_threshold, cache, args.transforms)
+        if cache is not None:
+            cache.evict()
+            cache.report()
+        if args.transforms:
+            args.transforms.report()
+    finally:
+        if cache is not None:
+            cache.close()
+
 
-main()
+if __name__ == "__main__":
+    main()
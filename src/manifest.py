@@ -0,0 +1,54 @@
+import hashlib, json, os
+
+MANIFEST_VERSION = 6
+
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        # read in chunks so big sources don't have to fit in memory twice
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def empty_manifest():
+    return {
+        "version": MANIFEST_VERSION,
+        "renderer": None,
+        "template": None,
+        "basepath": None,
+        "transforms": None,
+        "pages": {},
+        "assets": {},
+        "directories": {},
+    }
+
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return empty_manifest()
+    try:
+        with open(path, "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        # a corrupt manifest just means a full rebuild
+        return empty_manifest()
+    if manifest.get("version") != MANIFEST_VERSION:
+        return empty_manifest()
+    return manifest
+
+
+def save_manifest(path, manifest):
+    manifest_dir = os.path.dirname(path)
+    if manifest_dir:
+        os.makedirs(manifest_dir, exist_ok=True)
+    # write to a temp file first so an interrupted build never leaves half a manifest
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
@@ -1,20 +1,22 @@
 import re
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum
 from inlinemarkdown import *
-from htmlnode import HTMLNode, ParentNode, LeafNode
-
-def markdown_to_blocks(markdown):
-    block_list = []
-    split_blocks = markdown.split("\n\n")
-    for block in split_blocks:
-        strip_block = block.strip()
-        if strip_block != "":
-            lines = strip_block.split("\n")
-            processed_lines = [line.strip() for line in lines]
-            processed_block = "\n".join(processed_lines)
-            block_list.append(processed_block)
-
-    return block_list
+from htmlnode import HTMLNode, ParentNode, LeafNode, RawNode
+from blockcache import block_key
+from definitions import Definitions
+
+HEADING_PATTERN = re.compile(r"#{1,6} ")
+# "- ", "* ", "+ ", "1. " or "1) ", or a bare marker for an empty item
+LIST_ITEM_PATTERN = re.compile(r"( *)([-*+]|(\d{1,9})[.)])(?: +|$)")
+# deeper items are kept at this depth, so rendering never recurses without bound
+MAX_LIST_DEPTH = 64
+TABLE_DELIMITER_CELL_PATTERN = re.compile(r":?-+:?")
+TABLE_CELL_SPLIT_PATTERN = re.compile(r"(?<!\\)\|")
+# below this many characters a document renders faster in-process than via workers
+PARALLEL_THRESHOLD = 4 << 20
+# ranges per worker, so one slow range doesn't leave the other workers idle
+RANGES_PER_JOB = 4
 
 class BlockType(Enum):
     PARAGRAPH = "paragraph"
@@ -23,235 +25,553 @@ class BlockType(Enum):
     QUOTE = "quote"
     UNORDERED_LIST = "unordered_list"
     ORDERED_LIST = "ordered_list"
-
-def block_to_block_type(block):
-    lines = block.split("\n")
-
-    # check for heading
-    if block.startswith("#"):
-        if re.match(r'^#{1,6} ', block):
+    TABLE = "table"
+
+# blocks the page always renders itself, in document order: never cached and
+# never sent to a worker, so per-page transform state such as unique heading
+# ids sees them in order. A one-line heading is as cheap to render as to look up
+IN_ORDER_BLOCKS = {BlockType.HEADING}
+
+def renders_in_order(block_type, lines, definitions):
+    # headings, and blocks that may reference a footnote: each reference's id
+    # depends on how many references to the same footnote came before it
+    if block_type in IN_ORDER_BLOCKS:
+        return True
+    return bool(definitions and definitions.footnotes) and any("[^" in line for line in lines)
+
+class BlockClassifier:
+    # classifies a block one stripped line at a time, so no line is looked at twice
+    def __init__(self):
+        self.first_line = None
+        self.last_line = ""
+        self.count = 0
+        self.all_quotes = True
+        self.list_kind = None
+        self.table = False
+
+    def add(self, line):
+        if self.first_line is None:
+            self.first_line = line
+            # a block is a list when it starts with an item, whatever follows
+            self.list_kind = list_marker_kind(LIST_ITEM_PATTERN.match(line))
+        self.last_line = line
+        self.count += 1
+        if self.all_quotes and not line.startswith(">"):
+            self.all_quotes = False
+        if self.count == 2:
+            # a header row with pipes followed by a matching delimiter row
+            self.table = "|" in self.first_line and table_alignments(line, len(split_table_row(self.first_line))) is not None
+
+    def block_type(self):
+        first_line = self.first_line or ""
+        if HEADING_PATTERN.match(first_line):
             return BlockType.HEADING
-    
-    # check for code
-    if block.startswith("```") and block.endswith("```"):
-        return BlockType.CODE
-    
-    # check for quote
-    all_quotes = True
+        if first_line.startswith("```") and self.last_line.endswith("```"):
+            return BlockType.CODE
+        if self.count == 0:
+            return BlockType.PARAGRAPH
+        if self.table:
+            return BlockType.TABLE
+        if self.all_quotes:
+            return BlockType.QUOTE
+        if self.list_kind in (".", ")"):
+            return BlockType.ORDERED_LIST
+        if self.list_kind is not None:
+            return BlockType.UNORDERED_LIST
+        return BlockType.PARAGRAPH
+
+def list_marker_kind(match):
+    # "-", "*" or "+" for bullets, "." or ")" for numbers; items of different kinds start a new list
+    if match is None:
+        return None
+    return match.group(2)[-1]
+
+def indentation(line):
+    return len(line) - len(line.lstrip(" "))
+
+def continues_list(line, first_line):
+    # after a blank line a list goes on with indented lines and items of its own kind
+    if indentation(line) > indentation(first_line):
+        return True
+    kind = list_marker_kind(LIST_ITEM_PATTERN.match(line))
+    return kind is not None and kind == list_marker_kind(LIST_ITEM_PATTERN.match(first_line.lstrip(" ")))
+
+def split_table_row(line):
+    # "| a | b\\|c |" -> ["a", "b|c"], outer pipes are optional
+    line = line.strip()
+    if line.startswith("|"):
+        line = line[1:]
+    if line.endswith("|") and not line.endswith("\\|"):
+        line = line[:-1]
+    return [cell.strip().replace("\\|", "|") for cell in TABLE_CELL_SPLIT_PATTERN.split(line)]
+
+def table_alignments(line, columns):
+    # the align value of each column from a delimiter row like "| :-- | :-: | --: |",
+    # or None if line isn't a delimiter row for that many columns
+    cells = split_table_row(line)
+    if len(cells) != columns:
+        return None
+    alignments = []
+    for cell in cells:
+        if not TABLE_DELIMITER_CELL_PATTERN.fullmatch(cell):
+            return None
+        if cell.startswith(":") and cell.endswith(":"):
+            alignments.append("center")
+        elif cell.endswith(":"):
+            alignments.append("right")
+        elif cell.startswith(":"):
+            alignments.append("left")
+        else:
+            alignments.append(None)
+    return alignments
+
+def iter_lines(text):
+    # yield the lines of text one at a time without splitting the whole string up front
+    start = 0
+    while True:
+        end = text.find("\n", start)
+        if end == -1:
+            if start < len(text):
+                yield text[start:]
+            return
+        yield text[start:end]
+        start = end + 1
+
+def scan_blocks(lines, definitions=None):
+    # lines is any iterable of lines (a str's iter_lines, an open file, ...);
+    # yields (BlockType, lines) with each line's trailing whitespace removed.
+    # With definitions, [label]: url and [^note]: text lines starting a block
+    # are added to it instead of being yielded
+    block = []
+    classifier = BlockClassifier()
+    in_code = False
+    # a list block held open over blank lines until the next line shows whether it goes on
+    held = False
+    # indented lines right after a footnote definition continue its text
+    in_footnote = False
     for line in lines:
-        if not line.startswith(">"):
-            all_quotes = False
-            break
-    if all_quotes and lines:
-        return BlockType.QUOTE
-        
-    # check for unordered list
-    all_unordered = True
-    for line in lines:
-        if not line.startswith("- "):
-            all_unordered = False
-            break
-    if all_unordered and lines:
-        return BlockType.UNORDERED_LIST
-        
-    # check for ordered list
-    all_ordered = True
-    for i, line in enumerate(lines, 1):
-        if not line.startswith(f"{i}. "):
-            all_ordered = False
-            break
-    if all_ordered and lines:
-        return BlockType.ORDERED_LIST
-
-    # if none of the above it's a paragraph
-    return BlockType.PARAGRAPH
-
-def markdown_to_html_node(markdown):
-    parent_div = HTMLNode("div", None, [])
-    blocks = markdown_to_blocks(markdown)
-    for block in blocks:
-        block_type = block_to_block_type(block)
-        if block_type == BlockType.PARAGRAPH:
-            paragraph_content = " ".join(block.strip().split("\n"))
-
-            block_node = HTMLNode("p", None, [])
+        line = line.rstrip().expandtabs(4)
+        stripped = line.lstrip()
+
+        if in_code:
+            block.append(line)
+            if stripped.endswith("```"):
+                yield BlockType.CODE, block
+                block = []
+                in_code = False
+            continue
+
+        if in_footnote:
+            if stripped and line != stripped:
+                definitions.continue_footnote(stripped)
+                continue
+            in_footnote = False
+
+        if not stripped:
+            if block:
+                if classifier.list_kind is not None:
+                    held = True
+                    continue
+                yield classifier.block_type(), block
+                block = []
+                classifier = BlockClassifier()
+            continue
+
+        if held:
+            held = False
+            if continues_list(line, block[0]):
+                block.append("")
+                block.append(line)
+                classifier.add(stripped)
+                continue
+            yield classifier.block_type(), block
+            block = []
+            classifier = BlockClassifier()
+
+        if not block and definitions is not None and stripped.startswith("[") and definitions.add(stripped):
+            in_footnote = stripped.startswith("[^")
+            continue
+
+        if not block and stripped.startswith("```") and (stripped == "```" or not stripped.endswith("```")):
+            # an opening fence: blank lines no longer end the block until it closes
+            block.append(line)
+            in_code = True
+            continue
+
+        block.append(line)
+        classifier.add(stripped)
+
+    if block:
+        yield (BlockType.CODE if in_code else classifier.block_type()), block
 
-            # process text content of paragraph
-            children = text_to_children(paragraph_content)
-            if not children or len(children) == 0:
-                block_node.value = paragraph_content
-            else:
-                block_node.children = children
+def markdown_to_blocks(markdown):
+    block_list = []
+    for block_type, lines in scan_blocks(iter_lines(markdown)):
+        block_list.append("\n".join(line.strip() for line in lines))
+    return block_list
 
-            # add to parent div
-            parent_div.children.append(block_node)
+def block_to_block_type(block):
+    classifier = BlockClassifier()
+    for line in block.split("\n"):
+        classifier.add(line)
+    return classifier.block_type()
+
+def render_block(block_type, lines, cache, definitions=None, basepath="/", transforms=None):
+    # the block's html, taken from the cache when the same block was rendered before
+    if renders_in_order(block_type, lines, definitions):
+        return block_to_html_node(block_type, lines, definitions, basepath, transforms).to_html()
+    context = ""
+    if any("[" in line for line in lines):
+        # only blocks that may hold a link, image or reference depend on the basepath and definitions
+        context = basepath + "\0" + (definitions.fingerprint() if definitions else "")
+    if transforms:
+        context += "\0" + transforms.fingerprint()
+    key = block_key(block_type, lines, context)
+    html = cache.get(key)
+    if html is None:
+        html = block_to_html_node(block_type, lines, definitions, basepath, transforms).to_html()
+        cache.put(key, html)
+    return html
+
+def markdown_to_html_node(markdown, cache=None, basepath="/", transforms=None):
+    # markdown can be a string or any iterable of lines, e.g. an open file
+    if isinstance(markdown, str):
+        markdown = iter_lines(markdown)
+    # references may come before their definitions, so scan everything first
+    definitions = Definitions()
+    blocks = list(scan_blocks(markdown, definitions))
+    if transforms:
+        transforms.start_page()
+    parent_div = HTMLNode("div", None, [])
+    for block_type, lines in blocks:
+        if cache is None:
+            parent_div.children.append(block_to_html_node(block_type, lines, definitions, basepath, transforms))
+        else:
+            parent_div.children.append(RawNode(render_block(block_type, lines, cache, definitions, basepath, transforms)))
+    if definitions.footnotes:
+        parent_div.children.append(footnotes_to_html_node(definitions, basepath, transforms))
+    return parent_div
 
-        elif block_type == BlockType.HEADING:
-            # determine heading level (h1 - h3)
-            level = 0 # default to level 0
-            for char in block:
-                if char == '#':
-                    level += 1
-                else:
-                    break
+def footnotes_to_html_node(definitions, basepath="/", transforms=None):
+    # the footnotes in definition order, each linking back to its first reference
+    ol_node = HTMLNode("ol", None, [])
+    for label, (number, text) in definitions.footnotes.items():
+        li_node = HTMLNode("li", None, text_to_children(text, definitions, basepath), {"id": f"fn-{number}"})
+        li_node.children.append(HTMLNode(None, " "))
+        li_node.children.append(HTMLNode("a", "↩", None, {"href": f"#fnref-{number}"}))
+        ol_node.children.append(li_node)
+    section = HTMLNode("section", None, [ol_node], {"class": "footnotes"})
+    if transforms:
+        transforms.apply(section)
+    return section
+
+def render_block_range(blocks, definitions=None, basepath="/", transforms=None):
+    # blocks is a list of (BlockType, lines); runs in a worker process and
+    # returns each block's html, None for the blocks the page renders in
+    # order itself, with the transform timings of this worker's copy
+    fragments = [
+        None if renders_in_order(block_type, lines, definitions) else block_to_html_node(block_type, lines, definitions, basepath, transforms).to_html()
+        for block_type, lines in blocks
+    ]
+    return fragments, transforms.timings() if transforms else None
+
+def split_block_ranges(blocks, range_size):
+    # group scanned blocks into runs of roughly range_size characters, in document order
+    block_range = []
+    size = 0
+    for block_type, lines in blocks:
+        block_range.append((block_type, lines))
+        size += sum(len(line) + 1 for line in lines)
+        if size >= range_size:
+            yield block_range
+            block_range = []
+            size = 0
+    if block_range:
+        yield block_range
+
+def markdown_to_html(markdown, jobs=1, parallel_threshold=PARALLEL_THRESHOLD, cache=None, basepath="/", transforms=None):
+    # same output as markdown_to_html_node(markdown).to_html(), but a large
+    # document has its blocks rendered across jobs worker processes
+    if jobs <= 1 or len(markdown) < parallel_threshold:
+        return markdown_to_html_node(markdown, cache, basepath, transforms).to_html()
+
+    # the block cache is skipped here, a document this big is split for the workers anyway
+    range_size = max(1, len(markdown) // (jobs * RANGES_PER_JOB))
+    definitions = Definitions()
+    blocks = list(scan_blocks(iter_lines(markdown), definitions))
+    ranges = list(split_block_ranges(blocks, range_size))
+    if transforms:
+        transforms.start_page()
+    count = len(ranges)
+    fragments = []
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        # map keeps the ranges in order, so the fragments join back into the document
+        results = executor.map(render_block_range, ranges, [definitions] * count, [basepath] * count, [transforms] * count)
+        for block_range, (range_fragments, timings) in zip(ranges, results):
+            for (block_type, lines), html in zip(block_range, range_fragments):
+                if html is None:
+                    html = block_to_html_node(block_type, lines, definitions, basepath, transforms).to_html()
+                fragments.append(html)
+            if timings is not None:
+                transforms.add_timings(*timings)
+    if definitions.footnotes:
+        fragments.append(footnotes_to_html_node(definitions, basepath, transforms).to_html())
+    return "<div>" + "".join(fragments) + "</div>"
+
+def block_to_html_node(block_type, lines, definitions=None, basepath="/", transforms=None):
+    # transforms visit the block's nodes once it is built, in a single walk
+    block_node = build_block_node(block_type, lines, definitions, basepath, transforms)
+    if transforms:
+        transforms.apply(block_node)
+    return block_node
+
+def build_block_node(block_type, lines, definitions, basepath, transforms):
+    block = "\n".join(line.strip() for line in lines)
+    if block_type == BlockType.PARAGRAPH:
+        paragraph_content = " ".join(block.strip().split("\n"))
+
+        block_node = HTMLNode("p", None, [])
+
+        # process text content of paragraph
+        children = text_to_children(paragraph_content, definitions, basepath)
+        if not children or len(children) == 0:
+            block_node.value = paragraph_content
+        else:
+            block_node.children = children
+
+        return block_node
+
+    elif block_type == BlockType.HEADING:
+        # determine heading level (h1 - h3)
+        level = 0 # default to level 0
+        for char in block:
+            if char == '#':
+                level += 1
+            else:
+                break
 
-            # process heading text (without the # characters)
-            heading_content = block[level:].strip()
+        # process heading text (without the # characters)
+        heading_content = block[level:].strip()
 
-            # create block node
-            block_node = HTMLNode(f"h{level}", None, [])
+        # create block node
+        block_node = HTMLNode(f"h{level}", None, [])
 
-            # check if heading_conyent is empty
-            if not heading_content:
-                # if heading is empty, use empty string
-                block_node.value = ""
+        # check if heading_conyent is empty
+        if not heading_content:
+            # if heading is empty, use empty string
+            block_node.value = ""
+        else:
+            # make sure getting children for heading
+            children = text_to_children(heading_content, definitions, basepath)
+    
+            if not children or len(children) == 0:
+                block_node.value = heading_content
             else:
-                # make sure getting children for heading
-                children = text_to_children(heading_content)
-        
-                if not children or len(children) == 0:
-                    block_node.value = heading_content
-                else:
-                    block_node.children = children
+                block_node.children = children
 
-            # add to parent div
-            parent_div.children.append(block_node)
+        return block_node
 
-        elif block_type == BlockType.CODE:
-            pre_node = HTMLNode("pre", None, [])
-            code_node = HTMLNode("code", None , [])
+    elif block_type == BlockType.TABLE:
+        return RawNode("".join(table_to_html_parts(lines, definitions, basepath, transforms)))
 
-            # remove leading and trailing ``` and language identifier
-            code_content = extract_code_block_content(block)
+    elif block_type == BlockType.CODE:
+        pre_node = HTMLNode("pre", None, [])
 
-            # text node with code content
-            code_text_node = TextNode(code_content, TextType.TEXT)
+        # remove the fences, keeping indentation inside the block
+        code_content = code_lines_content(lines)
 
-            # convert to HTML node and add to the structure
-            code_html_node =text_node_to_html_node(code_text_node)
-            code_node.children.append(code_html_node)
-            pre_node.children.append(code_node)
+        # the text sits on the <code> element itself, which escapes it literally
+        pre_node.children.append(HTMLNode("code", code_content))
 
-            # add pre node (containing code node) to parent div
-            parent_div.children.append(pre_node)
+        return pre_node
 
-        elif block_type == BlockType.QUOTE:
-            # remove '>' prefix from each line and join with spaces
-            quote_lines = block.strip().split("\n")
-            # remove '<' character from beginning of each line
-            quote_lines = [line[1:].strip() if line.startswith(">") else line.strip() for line in quote_lines]
-            # join lines with spaces
-            quote_content = " ".join(quote_lines)
+    elif block_type == BlockType.QUOTE:
+        # remove '>' prefix from each line and join with spaces
+        quote_lines = block.strip().split("\n")
+        # remove '<' character from beginning of each line
+        quote_lines = [line[1:].strip() if line.startswith(">") else line.strip() for line in quote_lines]
+        # join lines with spaces
+        quote_content = " ".join(quote_lines)
 
-            # create blockquote node
-            block_node = HTMLNode("blockquote", None, [])
+        # create blockquote node
+        block_node = HTMLNode("blockquote", None, [])
 
-            # process quote text
-            children = text_to_children(quote_content)
+        # process quote text
+        children = text_to_children(quote_content, definitions, basepath)
 
-            if not children or len(children) == 0:
-                block_node.value = quote_content
-            else:
-                block_node.children = children
+        if not children or len(children) == 0:
+            block_node.value = quote_content
+        else:
+            block_node.children = children
 
-            # add to parent div
-            parent_div.children.append(block_node)
+        return block_node
 
-        elif block_type == BlockType.UNORDERED_LIST:
-            ul_node = HTMLNode("ul", None, [])
-            # split block into list items
-            lines = block.split("\n")
-            # skip empty lines
-            for line in lines:
-                if not line.strip():
-                    continue
-                # remove list marker
-                item_content = line.strip()
-                if item_content.startswith("- "):
-                    item_content = item_content[2:]
-                elif item_content.startswith("* "):
-                    item_content = item_content[2:]
-
-                # create list item node
-                li_node = HTMLNode("li", None, [])
-                li_node.children = text_to_children(item_content)
-                ul_node.children.append(li_node)
-
-            parent_div.children.append(ul_node)
-
-        elif block_type == BlockType.ORDERED_LIST:
-            ol_node = HTMLNode("ol", None, [])
-
-            # split block into list items
-            lines = block.split("\n")
-            for line in lines:
-                # skip empty lines
-                if not line.strip():
-                    continue
+    elif block_type == BlockType.UNORDERED_LIST or block_type == BlockType.ORDERED_LIST:
+        return list_block_to_html_node(lines, definitions, basepath, transforms)
 
-                # remove list marker
-                item_content = line.strip()
-                
-                # find where actual content starts
-                for i, char in enumerate(item_content):
-                    if i > 0 and char == '.' and item_content[:i].isdigit():
-                        # found period after number
-                        if i + 1 < len(item_content) and item_content[i+1] == ' ':
-                            item_content = item_content[i+2:] # skip number, period
-                        else:
-                            item_content = item_content[i+1:] # skip number and period
-                        break
-                # create list item node
-                li_node = HTMLNode("li", None, [])
-                li_node.children = text_to_children(item_content)
-                ol_node.children.append(li_node)
-
-            parent_div.children.append(ol_node)
+    raise ValueError(f"Invalid block type: {block_type}")
 
-    return parent_div
-    
-        
-def text_to_children(text):
-    nodes = [TextNode(text, TextType.TEXT)]
+class ListLevel:
+    # one open list while a list block is parsed
+    def __init__(self, kind, indent, content_indent, start):
+        self.kind = kind
+        self.indent = indent
+        self.content_indent = content_indent
+        self.start = start
+        # each item is a list of parts: paragraphs (lists of text lines) and nested ListLevels
+        self.items = []
 
-    nodes = extract_markdown_images(nodes)
-    nodes = extract_markdown_links(nodes)
+    def add_item(self, text):
+        self.items.append([[text]] if text else [])
 
-    # process bold text
-    nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
-
-    # process italic text
-    nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
-
-    # process code
-    nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
+def parse_list(lines):
+    # one pass over the lines of a list block; returns the top-level ListLevels
+    base = indentation(lines[0])
+    top_levels = []
+    stack = []
+    paragraph_break = False
+    for line in lines:
+        if not line.strip():
+            paragraph_break = True
+            continue
+        indent = max(indentation(line) - base, 0)
+        match = LIST_ITEM_PATTERN.match(line)
+
+        if match is not None:
+            kind = list_marker_kind(match)
+            text = line[match.end():].strip()
+            content_indent = indent + len(match.group(2)) + 1
+            # markers left of an open list close it
+            closed = None
+            while stack and indent < stack[-1].indent:
+                closed = stack.pop()
+            parts = stack[-1].items[-1] if stack and stack[-1].items else None
+            if closed is not None and indent > stack[-1].indent and parts and parts[-1] is closed and closed.kind == kind:
+                # between the parent's markers and the closed sublist's: the item joins that sublist
+                level = closed
+                stack.append(level)
+            elif stack and indent > stack[-1].indent and stack[-1].items and len(stack) < MAX_LIST_DEPTH:
+                # indented past the open list's markers, so it nests inside the current item
+                level = ListLevel(kind, indent, content_indent, match.group(3))
+                stack[-1].items[-1].append(level)
+                stack.append(level)
+            elif stack and stack[-1].kind == kind:
+                level = stack[-1]
+            else:
+                # a new list, or a different marker next to an open list
+                level = ListLevel(kind, indent, content_indent, match.group(3))
+                if stack:
+                    stack.pop()
+                if stack:
+                    stack[-1].items[-1].append(level)
+                else:
+                    top_levels.append(level)
+                stack.append(level)
+            level.add_item(text)
+            paragraph_break = False
+            continue
+
+        text = line.strip()
+        if paragraph_break:
+            # a paragraph after a blank line belongs to the deepest item it is indented under
+            while len(stack) > 1 and indent < stack[-1].content_indent:
+                stack.pop()
+            stack[-1].items[-1].append([text])
+            paragraph_break = False
+            continue
+        # otherwise the line continues the current item's text, however it is indented
+        parts = stack[-1].items[-1]
+        if parts and isinstance(parts[-1], list):
+            parts[-1].append(text)
+        else:
+            parts.append([text])
+    return top_levels
+
+def list_level_to_html_node(level, definitions=None, basepath="/"):
+    if level.kind in (".", ")"):
+        start = int(level.start)
+        list_node = HTMLNode("ol", None, [], {"start": str(start)} if start != 1 else None)
+    else:
+        list_node = HTMLNode("ul", None, [])
+    for parts in level.items:
+        # items with several paragraphs get <p>s, single-paragraph items stay tight
+        paragraphs = sum(1 for part in parts if isinstance(part, list))
+        children = []
+        for part in parts:
+            if isinstance(part, ListLevel):
+                children.append(list_level_to_html_node(part, definitions, basepath))
+            elif paragraphs > 1:
+                children.append(HTMLNode("p", None, text_to_children(" ".join(part), definitions, basepath)))
+            else:
+                children.extend(text_to_children(" ".join(part), definitions, basepath))
+        if children:
+            list_node.children.append(HTMLNode("li", None, children))
+        else:
+            list_node.children.append(LeafNode("li", ""))
+    return list_node
+
+def list_block_to_html_node(lines, definitions=None, basepath="/", transforms=None):
+    list_nodes = [list_level_to_html_node(level, definitions, basepath) for level in parse_list(lines)]
+    if len(list_nodes) == 1:
+        return list_nodes[0]
+    # different markers side by side make separate lists, visited before they are joined
+    if transforms:
+        for node in list_nodes:
+            transforms.apply(node)
+    return RawNode("".join(node.to_html() for node in list_nodes))
+
+def table_row_to_html(cells, alignments, cell_tag, definitions, basepath="/", transforms=None):
+    parts = ["<tr>"]
+    for i, alignment in enumerate(alignments):
+        # short rows are padded with empty cells, extra cells are dropped
+        cell = text_to_html(cells[i], definitions, basepath, transforms) if i < len(cells) else ""
+        if alignment is None:
+            parts.append(f"<{cell_tag}>{cell}</{cell_tag}>")
+        else:
+            parts.append(f'<{cell_tag} align="{alignment}">{cell}</{cell_tag}>')
+    parts.append("</tr>")
+    return "".join(parts)
+
+def table_to_html_parts(lines, definitions=None, basepath="/", transforms=None):
+    # yields the table one row at a time as strings; cells only become nodes
+    # when there are transforms to visit them
+    header = split_table_row(lines[0])
+    alignments = table_alignments(lines[1], len(header))
+    yield "<table><thead>"
+    yield table_row_to_html(header, alignments, "th", definitions, basepath, transforms)
+    yield "</thead>"
+    if len(lines) > 2:
+        yield "<tbody>"
+        for line in lines[2:]:
+            yield table_row_to_html(split_table_row(line), alignments, "td", definitions, basepath, transforms)
+        yield "</tbody>"
+    yield "</table>"
+
+def text_to_children(text, definitions=None, basepath="/"):
+    # images, links, bold, italic and code in a single pass over the text
+    nodes = tokenize_inline(text, definitions)
 
     # convert TextNode to HTMLNode
     html_nodes = []
     for node in nodes:
-        html_node = text_node_to_html_node(node)
+        html_node = text_node_to_html_node(node, basepath)
         html_nodes.append(html_node)
     
     return html_nodes
 
-def extract_code_block_content(block):
-    # remove first line with ``` an doptional language
-    lines = block.split("\n")
-    # find lines with backticks
-    start_index = -1
-    end_index = -1
-    for i, line in enumerate(lines):
-        if "```" in line:
-            if start_index == -1:
-                start_index = i
-            else:
-                end_index = i
-                break
-
-    # extract content between backticks
-    content_lines = lines[start_index + 1:end_index]
-
-    # join remaining lines with newlines
+def code_lines_content(lines):
+    # lines are the unstripped lines of a fenced block; indentation up to
+    # the opening fence's is removed, anything deeper belongs to the code
+    fence_indent = len(lines[0]) - len(lines[0].lstrip())
+    if len(lines) > 1 and lines[-1].strip().endswith("```"):
+        body = lines[1:-1]
+    else:
+        body = lines[1:]
+
+    content_lines = []
+    for line in body:
+        indent = len(line) - len(line.lstrip())
+        content_lines.append(line[min(indent, fence_indent):])
     content = "\n".join(content_lines)
 
     # ensure trailing newline
@@ -259,14 +579,3 @@ def extract_code_block_content(block):
         content += "\n"
 
     return content
-
-    
-
-
-
-
-
-
-    
-
-
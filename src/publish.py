@@ -0,0 +1,155 @@
+import ctypes, ctypes.util, errno, os, shutil
+
+AT_FDCWD = -100
+RENAME_EXCHANGE = 2
+COPY_CHUNK = 1 << 20
+
+# errors that mean "this fast path isn't available here", not "the copy failed"
+FAST_COPY_UNSUPPORTED = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF, errno.ENOTSUP}
+
+
+def staging_path(output):
+    parent, name = os.path.split(os.path.normpath(output))
+    # keep staging next to the output so the final rename stays on one filesystem
+    return os.path.join(parent, f".{name}.staging")
+
+
+def write_file_if_changed(path, content):
+    # leave identical files alone so their mtime doesn't tell rsync or watchers they changed;
+    # never write into an existing file: in staging it may be a hard link to the live site
+    data = content.encode("utf-8")
+    try:
+        if os.path.getsize(path) == len(data):
+            with open(path, "rb") as f:
+                if f.read() == data:
+                    return False
+    except FileNotFoundError:
+        pass
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return True
+
+
+def copy_file_contents(source_fd, destination_fd, size):
+    # let the kernel move the bytes: copy_file_range can share extents, sendfile skips userspace
+    copy_file_range = getattr(os, "copy_file_range", None)
+    if copy_file_range is not None:
+        try:
+            offset = 0
+            while offset < size:
+                sent = copy_file_range(source_fd, destination_fd, size - offset, offset, offset)
+                if sent == 0:
+                    break
+                offset += sent
+            return
+        except OSError as e:
+            if e.errno not in FAST_COPY_UNSUPPORTED:
+                raise
+            os.ftruncate(destination_fd, 0)
+
+    sendfile = getattr(os, "sendfile", None)
+    if sendfile is not None:
+        try:
+            os.lseek(destination_fd, 0, os.SEEK_SET)
+            offset = 0
+            while offset < size:
+                sent = sendfile(destination_fd, source_fd, offset, size - offset)
+                if sent == 0:
+                    break
+                offset += sent
+            return
+        except OSError as e:
+            if e.errno not in FAST_COPY_UNSUPPORTED:
+                raise
+            os.ftruncate(destination_fd, 0)
+
+    os.lseek(source_fd, 0, os.SEEK_SET)
+    os.lseek(destination_fd, 0, os.SEEK_SET)
+    while True:
+        chunk = os.read(source_fd, COPY_CHUNK)
+        if not chunk:
+            break
+        os.write(destination_fd, chunk)
+
+
+def copy_file(source, destination, link=False):
+    tmp_path = f"{destination}.tmp{os.getpid()}"
+    if link:
+        # a hard link costs no data at all when both sides share a filesystem
+        try:
+            os.link(source, tmp_path)
+            os.replace(tmp_path, destination)
+            return
+        except OSError:
+            if os.path.lexists(tmp_path):
+                os.remove(tmp_path)
+
+    with open(source, "rb") as fsrc, open(tmp_path, "wb") as fdst:
+        copy_file_contents(fsrc.fileno(), fdst.fileno(), os.fstat(fsrc.fileno()).st_size)
+    shutil.copystat(source, tmp_path)
+    os.replace(tmp_path, destination)
+
+
+def link_tree(source, destination):
+    # mirror source into destination with hard links, copying only when linking isn't possible
+    linked = 0
+    for root, dirs, files in os.walk(source):
+        relative_root = os.path.relpath(root, source)
+        target_root = os.path.normpath(os.path.join(destination, relative_root))
+        os.makedirs(target_root, exist_ok=True)
+        for name in files:
+            source_path = os.path.join(root, name)
+            target_path = os.path.join(target_root, name)
+            try:
+                os.link(source_path, target_path)
+            except OSError:
+                shutil.copy2(source_path, target_path)
+            linked += 1
+    return linked
+
+
+def prepare_staging(output, link_previous=True):
+    staging = staging_path(output)
+    if os.path.exists(staging):
+        # left over from a build that never published
+        shutil.rmtree(staging)
+    if link_previous and os.path.isdir(output):
+        link_tree(output, staging)
+    else:
+        os.mkdir(staging)
+    return staging
+
+
+def exchange_paths(first, second):
+    libc_name = ctypes.util.find_library("c")
+    libc = ctypes.CDLL(libc_name, use_errno=True)
+    renameat2 = getattr(libc, "renameat2", None)
+    if renameat2 is None:
+        raise OSError(errno.ENOSYS, "renameat2 is not available")
+    result = renameat2(AT_FDCWD, os.fsencode(first), AT_FDCWD, os.fsencode(second), RENAME_EXCHANGE)
+    if result != 0:
+        error = ctypes.get_errno()
+        raise OSError(error, os.strerror(error))
+
+
+def publish(staging, output):
+    if not os.path.exists(output):
+        os.rename(staging, output)
+        return
+
+    try:
+        # one atomic syscall: output is never missing or half-written
+        exchange_paths(staging, output)
+    except (OSError, AttributeError):
+        # no RENAME_EXCHANGE here, fall back to two renames with a tiny gap between them
+        previous = staging + ".old"
+        if os.path.exists(previous):
+            shutil.rmtree(previous)
+        os.rename(output, previous)
+        os.rename(staging, output)
+        staging = previous
+
+    # staging now holds the previous output
+    shutil.rmtree(staging)
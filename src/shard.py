@@ -0,0 +1,88 @@
+import hashlib, os
+from blockcache import RENDER_VERSION
+from manifest import empty_manifest, load_manifest
+from publish import copy_file
+
+
+def parse_shard(value):
+    # "2/4" -> (2, 4), shards are numbered from 1
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise ValueError(f"invalid shard {value!r}, expected i/n")
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"invalid shard {value!r}, need 1 <= i <= n")
+    return index, count
+
+
+def page_shard(content_relative_path, count):
+    # hash the path, not its position, so adding a page never moves the others
+    key = content_relative_path.replace(os.sep, "/").encode("utf-8")
+    return int.from_bytes(hashlib.sha1(key).digest()[:8], "big") % count + 1
+
+
+def shard_output_dir(shard_dir, index):
+    return os.path.join(shard_dir, str(index))
+
+
+def shard_manifest_path(shard_dir, index):
+    return os.path.join(shard_dir, f"{index}.json")
+
+
+def load_shard_manifests(shard_dir, count):
+    manifests = []
+    for index in range(1, count + 1):
+        path = shard_manifest_path(shard_dir, index)
+        if not os.path.exists(path):
+            raise ValueError(f"missing manifest for shard {index}/{count}: {path}")
+        manifest = load_manifest(path)
+        if manifest.get("shard") != [index, count]:
+            raise ValueError(f"{path} is not a manifest for shard {index}/{count}")
+        manifests.append(manifest)
+
+    # every shard has to come from this renderer and the same template, basepath and transforms
+    first = manifests[0]
+    if first["renderer"] != RENDER_VERSION:
+        raise ValueError(f"shards were built by renderer {first['renderer']}, rebuild them with renderer {RENDER_VERSION}")
+    for manifest in manifests[1:]:
+        if any(manifest[key] != first[key] for key in ("renderer", "template", "basepath", "transforms")):
+            raise ValueError("shards were built with different renderers, templates, basepaths or transforms")
+    return manifests
+
+
+def copy_file_if_changed(source, destination):
+    try:
+        if os.path.getsize(source) == os.path.getsize(destination):
+            with open(source, "rb") as f:
+                source_data = f.read()
+            with open(destination, "rb") as f:
+                if f.read() == source_data:
+                    return False
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    copy_file(source, destination)
+    return True
+
+
+def merge_shards(manifests, shard_dir, destination):
+    # copy every shard's pages into destination and return the combined manifest
+    merged = empty_manifest()
+    merged["renderer"] = manifests[0]["renderer"]
+    merged["template"] = manifests[0]["template"]
+    merged["basepath"] = manifests[0]["basepath"]
+    merged["transforms"] = manifests[0]["transforms"]
+
+    written = 0
+    for index, manifest in enumerate(manifests, 1):
+        output_dir = shard_output_dir(shard_dir, index)
+        for content_relative_path, page in manifest["pages"].items():
+            if content_relative_path in merged["pages"]:
+                raise ValueError(f"{content_relative_path} was built by more than one shard")
+            merged["pages"][content_relative_path] = page
+            source = os.path.join(output_dir, page["dest"])
+            if copy_file_if_changed(source, os.path.join(destination, page["dest"])):
+                written += 1
+
+    print(f"Merged {len(merged['pages'])} pages from {len(manifests)} shards (written: {written})")
+    return merged
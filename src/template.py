@@ -0,0 +1,71 @@
+import re
+
+SLOT_PATTERN = re.compile(r"\{\{ (\w+) \}\}")
+
+
+def basepath_url(url, basepath):
+    # a root-relative url served under basepath; "//host/..." and other urls are left alone
+    if basepath == "/" or not url.startswith("/") or url.startswith("//"):
+        return url
+    return basepath + url[1:]
+
+
+def rewrite_basepath(html, basepath):
+    if basepath == "/":
+        # root-relative links are already right for a site served from /
+        return html
+    html = html.replace('href="/', f'href="{basepath}')
+    html = html.replace('src="/', f'src="{basepath}')
+    return html
+
+
+class Template:
+    def __init__(self, text, basepath="/"):
+        self.basepath = basepath
+        # the template's own links only need rewriting once per build
+        text = rewrite_basepath(text, basepath)
+
+        # alternate static text and slot names: [text, slot, text, slot, ..., text]
+        self.segments = []
+        self.slots = []
+        last = 0
+        for match in SLOT_PATTERN.finditer(text):
+            self.segments.append(text[last:match.start()])
+            self.slots.append(match.group(1))
+            last = match.end()
+        self.segments.append(text[last:])
+
+    def render(self, **values):
+        parts = [self.segments[0]]
+        for slot, segment in zip(self.slots, self.segments[1:]):
+            value = values.get(slot)
+            if value is None:
+                # unknown slots are left in place, as the old str.replace did
+                parts.append(f"{{{{ {slot} }}}}")
+            else:
+                parts.append(value)
+            parts.append(segment)
+        return "".join(parts)
+
+    def render_to(self, out, **values):
+        # like render but written to out; a value may also be an iterable of
+        # fragments, which are written one by one and never joined
+        out.write(self.segments[0])
+        for slot, segment in zip(self.slots, self.segments[1:]):
+            value = values.get(slot)
+            if value is None:
+                out.write(f"{{{{ {slot} }}}}")
+            elif isinstance(value, str):
+                out.write(value)
+            else:
+                for fragment in value:
+                    out.write(fragment)
+            out.write(segment)
+
+    def __repr__(self):
+        return f"Template(slots: {self.slots}, {self.basepath})"
+
+
+def load_template(template_path, basepath="/"):
+    with open(template_path, "r") as f:
+        return Template(f.read(), basepath)
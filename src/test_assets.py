@@ -0,0 +1,72 @@
+import os, tempfile, unittest
+from assets import sync_static
+
+class TestSyncStatic(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.static = os.path.join(self.tmp.name, "static")
+        self.docs = os.path.join(self.tmp.name, "docs")
+        os.makedirs(os.path.join(self.static, "images"))
+        os.makedirs(self.docs)
+        self.write(os.path.join(self.static, "index.css"), "body {}")
+        self.write(os.path.join(self.static, "images", "a.png"), "png")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, "w") as f:
+            f.write(text)
+
+    def read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def test_first_sync_copies_everything(self):
+        assets, copied, unchanged, removed = sync_static(self.static, self.docs)
+        self.assertEqual((copied, unchanged, removed), (2, 0, 0))
+        self.assertEqual(sorted(assets), ["images/a.png", "index.css"])
+        self.assertEqual(self.read(os.path.join(self.docs, "images", "a.png")), "png")
+
+    def test_threaded_sync(self):
+        for i in range(20):
+            self.write(os.path.join(self.static, "images", f"{i}.png"), f"png {i}")
+        assets, copied, unchanged, removed = sync_static(self.static, self.docs, jobs=4)
+        self.assertEqual(copied, 22)
+        for i in range(20):
+            self.assertEqual(self.read(os.path.join(self.docs, "images", f"{i}.png")), f"png {i}")
+        self.assertEqual(sync_static(self.static, self.docs, assets, jobs=4)[1:], (0, 22, 0))
+
+    def test_linked_sync(self):
+        assets = sync_static(self.static, self.docs, link=True)[0]
+        self.assertTrue(os.path.samefile(os.path.join(self.static, "index.css"), os.path.join(self.docs, "index.css")))
+        self.assertEqual(sync_static(self.static, self.docs, assets, link=True)[1:], (0, 2, 0))
+
+    def test_second_sync_copies_nothing(self):
+        assets = sync_static(self.static, self.docs)[0]
+        self.assertEqual(sync_static(self.static, self.docs, assets)[1:], (0, 2, 0))
+
+    def test_changed_file_is_copied(self):
+        assets = sync_static(self.static, self.docs)[0]
+        self.write(os.path.join(self.static, "index.css"), "body { color: red; }")
+        self.assertEqual(sync_static(self.static, self.docs, assets)[1:], (1, 1, 0))
+        self.assertEqual(self.read(os.path.join(self.docs, "index.css")), "body { color: red; }")
+
+    def test_same_size_different_bytes_is_copied(self):
+        sync_static(self.static, self.docs)
+        self.write(os.path.join(self.static, "index.css"), "body {{")
+        os.utime(os.path.join(self.docs, "index.css"), ns=(0, 0))
+        self.assertEqual(sync_static(self.static, self.docs)[1:], (1, 1, 0))
+        self.assertEqual(self.read(os.path.join(self.docs, "index.css")), "body {{")
+
+    def test_removed_source_is_deleted_but_pages_are_kept(self):
+        assets = sync_static(self.static, self.docs)[0]
+        self.write(os.path.join(self.docs, "index.html"), "<p>page</p>")
+        os.remove(os.path.join(self.static, "images", "a.png"))
+        self.assertEqual(sync_static(self.static, self.docs, assets)[1:], (0, 1, 1))
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "images")))
+        self.assertTrue(os.path.exists(os.path.join(self.docs, "index.html")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+import os, pickle, shutil, sqlite3, tempfile, unittest
+from unittest import mock
+import blockcache
+from blockcache import BlockCache, block_key
+from markdownblock import BlockType, markdown_to_html_node
+
+MARKDOWN = """# Title
+
+Shared **disclaimer** text.
+
+- one
+- two
+"""
+
+
+class TestBlockCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "cache", "blocks.sqlite")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_key_depends_on_type_and_text(self):
+        key = block_key(BlockType.PARAGRAPH, ["a", "b"])
+        self.assertEqual(key, block_key(BlockType.PARAGRAPH, ["a", "b"]))
+        self.assertNotEqual(key, block_key(BlockType.QUOTE, ["a", "b"]))
+        self.assertNotEqual(key, block_key(BlockType.PARAGRAPH, ["a b"]))
+
+    def test_get_put_and_stats(self):
+        cache = BlockCache(self.path)
+        self.assertIsNone(cache.get("k"))
+        cache.put("k", "<p>x</p>")
+        self.assertEqual(cache.get("k"), "<p>x</p>")
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        cache.close()
+
+    def test_persists_across_builds(self):
+        cache = BlockCache(self.path)
+        expected = markdown_to_html_node(MARKDOWN).to_html()
+        self.assertEqual(markdown_to_html_node(MARKDOWN, cache).to_html(), expected)
+        # the heading is always rendered, never cached
+        self.assertEqual((cache.hits, cache.misses), (0, 2))
+        cache.close()
+
+        cache = BlockCache(self.path)
+        self.assertEqual(markdown_to_html_node(MARKDOWN, cache).to_html(), expected)
+        self.assertEqual((cache.hits, cache.misses), (2, 0))
+        cache.close()
+
+    def test_evicts_least_recently_used(self):
+        cache = BlockCache(self.path, max_bytes=10)
+        cache.put("old", "aaaaa")
+        cache.put("new", "bbbbb")
+        cache.put("used", "ccccc")
+        cache.get("old")
+        cache.flush()
+        self.assertEqual(cache.evict(), 1)
+        self.assertIsNone(cache.get("new"))
+        self.assertEqual(cache.get("old"), "aaaaa")
+        self.assertEqual(cache.entries(), (2, 10))
+        cache.close()
+
+    def test_basepath_is_part_of_the_key(self):
+        cache = BlockCache(self.path)
+        md = "[home](/)\n\nno links"
+        self.assertEqual(markdown_to_html_node(md, cache).to_html(), '<div><p><a href="/">home</a></p><p>no links</p></div>')
+        self.assertEqual(markdown_to_html_node(md, cache, "/site/").to_html(), '<div><p><a href="/site/">home</a></p><p>no links</p></div>')
+        # the block without links is shared between basepaths
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+        cache.close()
+
+    def test_concurrent_writers_do_not_wait_on_each_other(self):
+        # neither cache flushes by hand, as two page workers wouldn't mid-page
+        with mock.patch.object(blockcache, "LOCK_TIMEOUT", 0.2), mock.patch.object(blockcache, "WRITE_BATCH", 2):
+            first = BlockCache(self.path)
+            second = BlockCache(self.path)
+            for i in range(5):
+                first.put(f"a{i}", "x")
+                second.put(f"b{i}", "y")
+                self.assertFalse(first.connection is not None and first.connection.in_transaction)
+                self.assertFalse(second.connection is not None and second.connection.in_transaction)
+            first.close()
+            second.close()
+        cache = BlockCache(self.path)
+        self.assertEqual(cache.entries(), (10, 10))
+        cache.close()
+
+    def test_retries_the_switch_to_wal(self):
+        # a new file being switched to WAL by another process fails at once, not after the timeout
+        connect = sqlite3.connect
+
+        class Racing:
+            def __init__(self, *args, **kwargs):
+                self.connection = connect(*args, **kwargs)
+                self.failures = 2
+
+            def execute(self, sql, *args):
+                if sql.startswith("PRAGMA journal_mode") and self.failures:
+                    self.failures -= 1
+                    raise sqlite3.OperationalError("database is locked")
+                return self.connection.execute(sql, *args)
+
+            def __getattr__(self, name):
+                return getattr(self.connection, name)
+
+        with mock.patch.object(blockcache.sqlite3, "connect", Racing):
+            cache = BlockCache(self.path)
+            cache.put("k", "<p>x</p>")
+            cache.flush()
+            self.assertEqual(cache.connection.failures, 0)
+            cache.close()
+        cache = BlockCache(self.path)
+        self.assertEqual(cache.get("k"), "<p>x</p>")
+        cache.close()
+
+    def test_pending_fragments_are_served(self):
+        cache = BlockCache(self.path)
+        cache.put("k", "v")
+        self.assertEqual(cache.get("k"), "v")
+        self.assertEqual(cache.entries(), (1, 1))
+        cache.close()
+
+    def test_footnote_references_skip_the_cache(self):
+        # the same block renders with a different reference id further down the page
+        md = "See[^n].\n\nSee[^n].\n\n[^n]: Note."
+        cache = BlockCache(self.path)
+        for i in range(2):
+            html = markdown_to_html_node(md, cache).to_html()
+            self.assertIn('<sup id="fnref-1-2">', html)
+        self.assertEqual((cache.hits, cache.misses), (0, 0))
+        cache.close()
+
+    def test_pickled_copy_reopens_with_fresh_counts(self):
+        cache = BlockCache(self.path)
+        cache.put("k", "v")
+        cache.get("k")
+        cache.flush()
+        copy = pickle.loads(pickle.dumps(cache))
+        self.assertEqual((copy.hits, copy.misses), (0, 0))
+        self.assertEqual(copy.get("k"), "v")
+        copy.close()
+        cache.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+from dependencies import dependencies_changed, page_dependencies, referenced_images, resolve_asset
+
+ASSETS = {
+    "images/a.png": {"size": 3, "mtime": 10},
+    "blog/b.png": {"size": 4, "mtime": 20},
+}
+
+class TestDependencies(unittest.TestCase):
+    def test_referenced_images(self):
+        md = "# T\n\n![a](/images/a.png) and [link](/images/x.png) ![b](b.png)"
+        self.assertEqual(referenced_images(md), ["/images/a.png", "b.png"])
+
+    def test_referenced_images_through_definitions(self):
+        md = "# T\n\n![a][logo]\n\n[logo]: /images/logo.png\n[^1]: not a url"
+        self.assertEqual(referenced_images(md), ["/images/logo.png"])
+
+    def test_resolve_root_relative(self):
+        self.assertEqual(resolve_asset("/images/a.png", "index.md", ASSETS), "images/a.png")
+        self.assertEqual(resolve_asset("/images/a.png?v=2", "index.md", ASSETS), "images/a.png")
+
+    def test_resolve_page_relative(self):
+        self.assertEqual(resolve_asset("b.png", "blog/post.md", ASSETS), "blog/b.png")
+        self.assertEqual(resolve_asset("../images/a.png", "blog/post.md", ASSETS), "images/a.png")
+
+    def test_resolve_ignores_external_and_unknown(self):
+        self.assertIsNone(resolve_asset("https://example.com/a.png", "index.md", ASSETS))
+        self.assertIsNone(resolve_asset("/images/missing.png", "index.md", ASSETS))
+        self.assertIsNone(resolve_asset("", "index.md", ASSETS))
+
+    def test_page_dependencies(self):
+        self.assertEqual(
+            page_dependencies(["/images/a.png", "https://x/y.png"], "index.md", ASSETS),
+            {"images/a.png": "3:10"},
+        )
+
+    def test_dependencies_changed(self):
+        dependencies = {"images/a.png": "3:10"}
+        self.assertFalse(dependencies_changed(dependencies, ASSETS))
+        self.assertTrue(dependencies_changed(dependencies, {"images/a.png": {"size": 3, "mtime": 11}}))
+        self.assertTrue(dependencies_changed(dependencies, {}))
+
+
+if __name__ == "__main__":
+    unittest.main()
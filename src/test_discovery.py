@@ -0,0 +1,75 @@
+import os, tempfile, unittest
+from unittest import mock
+from discovery import Page, discover_pages
+
+class TestDiscoverPages(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.content = self.tmp.name
+        for path in ["index.md", "blog/b.md", "blog/a.md", "blog/notes.txt", "drafts/wip.md", "md.md/page.md"]:
+            self.write(path, "# x")
+        # make every directory look old enough to be cached
+        for root, dirs, files in os.walk(self.content):
+            os.utime(root, ns=(0, 0))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, relative_path, text):
+        path = os.path.join(self.content, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+
+    def paths(self, pages):
+        return [page.relative_path for page in pages]
+
+    def test_sorted_markdown_pages(self):
+        pages = discover_pages(self.content)
+        self.assertEqual(self.paths(pages), ["blog/a.md", "blog/b.md", "drafts/wip.md", "index.md", "md.md/page.md"])
+        self.assertEqual(pages[0].size, 3)
+
+    def test_html_path_only_swaps_extension(self):
+        self.assertEqual(Page("md.md/page.md", 0, 0).html_relative_path, "md.md/page.html")
+        self.assertEqual(Page("blog/a.md", 0, 0).html_relative_path, "blog/a.html")
+
+    def test_include_and_exclude(self):
+        pages = discover_pages(self.content, include=["*.md", "*.txt"], exclude=["drafts", "md.md/*"])
+        self.assertEqual(self.paths(pages), ["blog/a.md", "blog/b.md", "blog/notes.txt", "index.md"])
+
+    def test_snapshot_skips_unchanged_directories(self):
+        snapshot = {}
+        first = discover_pages(self.content, snapshot=snapshot)
+        self.assertEqual(sorted(snapshot), ["", "blog", "drafts", "md.md"])
+
+        with mock.patch("discovery.os.scandir", side_effect=AssertionError("scandir called")):
+            self.assertEqual(discover_pages(self.content, snapshot=snapshot), first)
+
+    def test_fresh_scan_stats_only_directories(self):
+        # files take their stat from the scan's DirEntry, os.stat is only for directory mtimes
+        with mock.patch("discovery.os.stat", wraps=os.stat) as stat:
+            pages = discover_pages(self.content)
+        self.assertEqual(pages[0].size, 3)
+        stated = [os.path.relpath(call.args[0], self.content) for call in stat.call_args_list]
+        self.assertEqual(sorted(stated), [".", "blog", "drafts", "md.md"])
+
+    def test_snapshot_sees_new_files_and_edits(self):
+        snapshot = {}
+        discover_pages(self.content, snapshot=snapshot)
+        self.write("blog/c.md", "# new page")
+        self.write("index.md", "# edited")
+        pages = discover_pages(self.content, snapshot=snapshot)
+        self.assertIn("blog/c.md", self.paths(pages))
+        self.assertEqual(pages[self.paths(pages).index("index.md")].size, len("# edited"))
+
+    def test_snapshot_forgets_removed_directories(self):
+        snapshot = {}
+        discover_pages(self.content, snapshot=snapshot)
+        os.remove(os.path.join(self.content, "drafts", "wip.md"))
+        os.rmdir(os.path.join(self.content, "drafts"))
+        discover_pages(self.content, snapshot=snapshot)
+        self.assertNotIn("drafts", snapshot)
+
+
+if __name__ == "__main__":
+    unittest.main()
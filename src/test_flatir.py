@@ -0,0 +1,85 @@
+import io, unittest
+from flatir import ELEMENT, TEXT, VALUE, VOID, FlatDocument, flat_document_from_html_node, markdown_to_flat_document
+from markdownblock import markdown_to_html_node
+
+MARKDOWN = """# A <title> & more
+
+Some **bold**, _italic_ and `a < b &lt;` text with a [link](/about "x") and ![cat](/cat.png).
+
+```
+if a < b:
+    pass
+```
+
+- one
+  - nested
+- two
+
+3. three
+4. four
+
+> quoted
+
+| a | b |
+|:--|--:|
+| 1 | 2 |
+
+See [the docs][docs] and the note[^1]. [](/empty)
+
+The note[^1] again.
+
+[docs]: /docs
+[^1]: A footnote.
+"""
+
+
+class TestFlatDocument(unittest.TestCase):
+    def test_same_html_as_the_tree(self):
+        self.assertEqual(markdown_to_flat_document(MARKDOWN).to_html(), markdown_to_html_node(MARKDOWN).to_html())
+
+    def test_paragraph(self):
+        document = markdown_to_flat_document("plain **bold**")
+        self.assertEqual(document.to_html(), "<div><p>plain <b>bold</b></p></div>")
+        self.assertEqual(list(document.kinds), [ELEMENT, ELEMENT, TEXT, ELEMENT, VALUE])
+        self.assertEqual(document.parents(), [-1, 0, 1, 1, 3])
+        self.assertEqual([document.tag(index) for index in (0, 1, 3)], ["div", "p", "b"])
+
+    def test_arrays_stay_parallel(self):
+        document = markdown_to_flat_document(MARKDOWN)
+        for values in (document.opening_ids, document.starts, document.closes):
+            self.assertEqual(len(values), len(document))
+
+    def test_void_element(self):
+        document = markdown_to_flat_document("![cat](/cat.png)")
+        self.assertEqual(document.kinds[2], VOID)
+        self.assertEqual(document.to_html(), '<div><p><img src="/cat.png" alt="cat"></p></div>')
+
+    def test_write_html(self):
+        document = markdown_to_flat_document(MARKDOWN)
+        out = io.StringIO()
+        document.write_html(out)
+        self.assertEqual(out.getvalue(), document.to_html())
+
+    def test_round_trip(self):
+        node = markdown_to_html_node(MARKDOWN)
+        document = flat_document_from_html_node(node)
+        self.assertEqual(document.to_html(), node.to_html())
+        self.assertEqual(document.to_html_node().to_html(), node.to_html())
+
+    def test_round_trip_keeps_entities(self):
+        md = "a &amp;lt; b & c &copy; **&amp;** `&lt;x&gt; & y`\n\n```\n&amp;\n```"
+        node = markdown_to_html_node(md)
+        tree = flat_document_from_html_node(node).to_html_node()
+        self.assertEqual(tree.to_html(), node.to_html())
+        self.assertEqual(tree.children[0].children[0].value, "a &amp;lt; b & c &copy; ")
+        self.assertEqual(tree.children[0].children[3].value, "&lt;x&gt; & y")
+
+    def test_empty(self):
+        self.assertEqual(len(FlatDocument()), 0)
+        self.assertEqual(FlatDocument().to_html(), "")
+        with self.assertRaises(ValueError):
+            FlatDocument().to_html_node()
+
+
+if __name__ == "__main__":
+    unittest.main()
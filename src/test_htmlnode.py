@@ -1,5 +1,5 @@
-import unittest
-from htmlnode import HTMLNode, LeafNode, ParentNode
+import io, pickle, unittest
+from htmlnode import HTMLNode, LeafNode, ParentNode, RawNode, escape_attribute, escape_html
 
 class TestHTMLNode(unittest.TestCase):
     def test_props_to_html(self):
@@ -156,6 +156,66 @@ class TestHTMLNode(unittest.TestCase):
         )
 
 
+class TestEscaping(unittest.TestCase):
+    def test_fast_path_returns_same_string(self):
+        text = "nothing to do here"
+        self.assertIs(escape_html(text), text)
+        self.assertIs(escape_attribute(text), text)
+
+    def test_escape_html(self):
+        self.assertEqual(escape_html("a < b && c > d"), "a &lt; b &amp;&amp; c &gt; d")
+        # quotes are fine in text, entities that are already there are kept
+        self.assertEqual(escape_html('"x" &amp; &#8212; &copy;'), '"x" &amp; &#8212; &copy;')
+
+    def test_escape_attribute(self):
+        self.assertEqual(escape_attribute('/a?x=1&y="2"'), "/a?x=1&amp;y=&quot;2&quot;")
+
+    def test_nodes_escape_values_and_props(self):
+        self.assertEqual(LeafNode("a", "<b>", {"href": '/"x"'}).to_html(), '<a href="/&quot;x&quot;">&lt;b&gt;</a>')
+        self.assertEqual(LeafNode(None, "1 < 2").to_html(), "1 &lt; 2")
+        self.assertEqual(HTMLNode(None, "a & b").to_html(), "a &amp; b")
+        self.assertEqual(HTMLNode("img", "", None, {"alt": 'say "hi"'}).to_html(), '<img alt="say &quot;hi&quot;">')
+        self.assertEqual(ParentNode("p", [LeafNode("b", "<>")]).to_html(), "<p><b>&lt;&gt;</b></p>")
+
+    def test_raw_node_is_not_escaped_again(self):
+        self.assertEqual(ParentNode("div", [RawNode("<p>&lt;</p>")]).to_html(), "<div><p>&lt;</p></div>")
+
+
+class TestWriteHtml(unittest.TestCase):
+    def test_writes_into_one_sink(self):
+        node = ParentNode("div", [
+            HTMLNode("p", None, [HTMLNode(None, "a "), LeafNode("b", "b", {"class": "x"})]),
+            HTMLNode("img", "", None, {"src": "/i.png"}),
+            RawNode("<hr>"),
+        ])
+        out = io.StringIO()
+        node.write_html(out)
+        self.assertEqual(out.getvalue(), '<div><p>a <b class="x">b</b></p><img src="/i.png"><hr></div>')
+        self.assertEqual(node.to_html(), out.getvalue())
+
+    def test_errors_are_kept(self):
+        with self.assertRaises(ValueError):
+            HTMLNode("p").to_html()
+        with self.assertRaises(ValueError):
+            LeafNode("p", None).to_html()
+        with self.assertRaises(ValueError):
+            ParentNode(None, []).to_html()
+
+
+class TestSlots(unittest.TestCase):
+    def test_no_instance_dict(self):
+        for node in (HTMLNode("p", "x"), LeafNode("b", "x"), ParentNode("p", []), RawNode("<hr>")):
+            self.assertFalse(hasattr(node, "__dict__"))
+
+    def test_attributes_and_pickling(self):
+        node = ParentNode("p", [LeafNode("a", "x", {"href": "/"})], {"class": "c"})
+        copy = pickle.loads(pickle.dumps(node))
+        self.assertEqual(copy.to_html(), node.to_html())
+        self.assertEqual(repr(copy), repr(node))
+        node.value = "changed"
+        self.assertEqual(node.value, "changed")
+
+
 if __name__ == "__main__":
     unittest.main()
 
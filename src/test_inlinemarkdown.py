@@ -1,6 +1,7 @@
 import unittest
 from textnode import TextNode, TextType
-from inlinemarkdown import split_nodes_delimiter, extract_markdown_images, extract_markdown_links, split_nodes_image, split_nodes_link, text_to_textnodes
+from definitions import Definitions
+from inlinemarkdown import split_nodes_delimiter, extract_markdown_images, extract_markdown_links, split_nodes_image, split_nodes_link, text_to_html, text_to_textnodes, tokenize_inline, text_node_to_html_node
 
 
 class TestSplitNodesDlimiter(unittest.TestCase):
@@ -286,6 +287,140 @@ class TestTextToTextNodes(unittest.TestCase):
         )
 
 
+class TestTokenizeInline(unittest.TestCase):
+    def split_pipeline(self, text):
+        nodes = split_nodes_link(split_nodes_image([TextNode(text, TextType.TEXT)]))
+        nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
+        nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
+        return split_nodes_delimiter(nodes, "`", TextType.CODE)
+
+    def test_matches_split_pipeline(self):
+        texts = [
+            "plain text",
+            "**bold** at start and _italic_ at end",
+            "**bold**_italic_`code`",
+            "an ![image](/a.png) then a [link](/b) and ![another](c.png)",
+            "![only image](x.png)",
+            "[a](b)[c](d)",
+            "brackets [not a link] and (parens) and ! marks",
+            "bang before link ![no](",
+            "****",
+        ]
+        for text in texts:
+            self.assertEqual(tokenize_inline(text), self.split_pipeline(text), text)
+
+    def test_code_is_literal(self):
+        self.assertEqual(
+            tokenize_inline("use `snake_case_name` here"),
+            [
+                TextNode("use ", TextType.TEXT),
+                TextNode("snake_case_name", TextType.CODE),
+                TextNode(" here", TextType.TEXT),
+            ],
+        )
+
+    def test_empty_delimiters_are_dropped(self):
+        self.assertEqual(tokenize_inline("a****b"), [TextNode("a", TextType.TEXT), TextNode("b", TextType.TEXT)])
+
+    def test_unclosed_delimiter_is_text(self):
+        self.assertEqual(tokenize_inline("this **never closes"), [TextNode("this **never closes", TextType.TEXT)])
+        self.assertEqual(
+            tokenize_inline("a _b_ and _c"),
+            [TextNode("a ", TextType.TEXT), TextNode("b", TextType.ITALIC), TextNode(" and _c", TextType.TEXT)],
+        )
+
+    def test_intraword_underscores(self):
+        self.assertEqual(
+            tokenize_inline("call my_snake_case_function now"),
+            [TextNode("call my_snake_case_function now", TextType.TEXT)],
+        )
+        self.assertEqual(
+            tokenize_inline("_see my_var here_"),
+            [TextNode("see my_var here", TextType.ITALIC)],
+        )
+
+    def test_split_delimiter_unclosed(self):
+        node = TextNode("a `b` c `d", TextType.TEXT)
+        self.assertEqual(
+            split_nodes_delimiter([node], "`", TextType.CODE),
+            [TextNode("a ", TextType.TEXT), TextNode("b", TextType.CODE), TextNode(" c `d", TextType.TEXT)],
+        )
+
+    def test_empty_text(self):
+        self.assertEqual(tokenize_inline(""), [])
+
+
+class TestReferences(unittest.TestCase):
+    def definitions(self, *lines):
+        definitions = Definitions()
+        for line in lines:
+            self.assertTrue(definitions.add(line))
+        return definitions
+
+    def test_full_collapsed_and_shortcut(self):
+        definitions = self.definitions("[Docs]: /docs", "[img]: /a.png 'Logo'")
+        self.assertEqual(
+            tokenize_inline("[read][docs] [docs][] [DOCS] ![logo][img]", definitions),
+            [
+                TextNode("read", TextType.LINK, "/docs"),
+                TextNode(" ", TextType.TEXT),
+                TextNode("docs", TextType.LINK, "/docs"),
+                TextNode(" ", TextType.TEXT),
+                TextNode("DOCS", TextType.LINK, "/docs"),
+                TextNode(" ", TextType.TEXT),
+                TextNode("logo", TextType.IMAGE, "/a.png"),
+            ],
+        )
+
+    def test_undefined_references_stay_text(self):
+        definitions = self.definitions("[docs]: /docs")
+        self.assertEqual(
+            tokenize_inline("[a][missing] [b] [^1]", definitions),
+            [TextNode("[a][missing] [b] [^1]", TextType.TEXT)],
+        )
+
+    def test_inline_links_win(self):
+        definitions = self.definitions("[a]: /ref")
+        self.assertEqual(tokenize_inline("[a](/inline)", definitions), [TextNode("a", TextType.LINK, "/inline")])
+
+    def test_footnotes_numbered_by_definition(self):
+        definitions = self.definitions("[^b]: second", "[^a]: first", "[^b]: ignored")
+        self.assertEqual(definitions.footnotes, {"b": (1, "second"), "a": (2, "first")})
+        self.assertEqual(
+            tokenize_inline("x[^a]", definitions),
+            [TextNode("x", TextType.TEXT), TextNode("2", TextType.FOOTNOTE, "#fn-2", "fnref-2")],
+        )
+        self.assertEqual(tokenize_inline("[^a]", definitions), [TextNode("2", TextType.FOOTNOTE, "#fn-2", "fnref-2-2")])
+
+    def test_not_definitions(self):
+        definitions = Definitions()
+        self.assertFalse(definitions.add("[Note]: this is important"))
+        self.assertFalse(definitions.add("[a](/b)"))
+        self.assertFalse(definitions)
+
+
+class TestTextToHtml(unittest.TestCase):
+    def definitions(self):
+        # references are numbered per page, so each rendering gets its own
+        definitions = Definitions()
+        definitions.add("[^n]: note")
+        return definitions
+
+    def test_matches_node_rendering(self):
+        text = "plain **b** _i_ `c` [l](/u) ![a](/i.png) x[^n] y[^n]"
+        nodes = tokenize_inline(text, self.definitions())
+        expected = "".join(text_node_to_html_node(node).to_html() for node in nodes)
+        self.assertIn('y<sup id="fnref-1-2">', expected)
+        self.assertEqual(text_to_html(text, self.definitions()), expected)
+        self.assertEqual(text_to_html("no markup"), "no markup")
+
+    def test_basepath(self):
+        text = "[l](/u) ![a](/i.png) [e](https://x/) `[c](/c)`"
+        expected = "".join(text_node_to_html_node(node, "/site/").to_html() for node in tokenize_inline(text))
+        self.assertEqual(expected, '<a href="/site/u">l</a> <img src="/site/i.png" alt="a"> <a href="https://x/">e</a> <code>[c](/c)</code>')
+        self.assertEqual(text_to_html(text, basepath="/site/"), expected)
+
+
 if __name__ == "__main__":
     unittest.main()
 
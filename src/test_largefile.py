@@ -0,0 +1,99 @@
+import os, shutil, tempfile, unittest
+from unittest import mock
+import largefile
+from blockcache import BlockCache
+from largefile import extract_title_from_lines, iter_mmap_lines, render_large_page
+from main import render_page, render_page_to_file
+from template import Template
+
+TEMPLATE = '<title>{{ Title }}</title><link href="/index.css" />{{ Content }}'
+MARKDOWN = """# Big page
+
+Some **bold** text with a [link](/about) and ![cat](/images/cat.png).
+
+```
+  indented code
+```
+
+- one
+- two
+
+> quoted
+
+See [the docs][docs] and the note[^1].
+
+[docs]: /docs
+[^1]: A footnote.
+"""
+
+
+class TestIterMmapLines(unittest.TestCase):
+    def test_lines(self):
+        self.assertEqual(list(iter_mmap_lines(b"a\nb\n\nc")), ["a", "b", "", "c"])
+        self.assertEqual(list(iter_mmap_lines(b"a\n")), ["a"])
+        self.assertEqual(list(iter_mmap_lines(b"")), [])
+
+    def test_title(self):
+        self.assertEqual(extract_title_from_lines(["text", "# Title  "]), "Title")
+        with self.assertRaises(Exception):
+            extract_title_from_lines(["## not a title"])
+
+
+class TestRenderLargePage(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.source = os.path.join(self.tmp, "big.md")
+        with open(self.source, "w") as f:
+            f.write(MARKDOWN)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def test_matches_in_memory_render(self):
+        template = Template(TEMPLATE, "/site/")
+        dest = os.path.join(self.tmp, "big.html")
+        written, urls = render_large_page(self.source, dest, template)
+        self.assertTrue(written)
+        self.assertEqual(urls, ["/images/cat.png", "/docs"])
+        self.assertEqual(self.read(dest), render_page(MARKDOWN, template))
+
+    def test_identical_output_not_rewritten(self):
+        template = Template(TEMPLATE)
+        dest = os.path.join(self.tmp, "big.html")
+        render_large_page(self.source, dest, template)
+        written, urls = render_large_page(self.source, dest, template)
+        self.assertFalse(written)
+        self.assertEqual(sorted(os.listdir(self.tmp)), ["big.html", "big.md"])
+
+    def test_threshold_switches_mode(self):
+        template = Template(TEMPLATE)
+        small = os.path.join(self.tmp, "out", "small.html")
+        large = os.path.join(self.tmp, "out", "large.html")
+        render_page_to_file(self.source, small, template)
+        render_page_to_file(self.source, large, template, large_file_threshold=1)
+        self.assertEqual(self.read(small), self.read(large))
+
+    def test_cache_skips_tables_and_big_blocks(self):
+        template = Template(TEMPLATE)
+        source = os.path.join(self.tmp, "table.md")
+        with open(source, "w") as f:
+            f.write("# T\n\n| a |\n|---|\n| ![x](/x.png) |\n\n" + "word " * 100 + "\n\nsmall\n")
+        cache = BlockCache(os.path.join(self.tmp, "blocks.sqlite"))
+        dest = os.path.join(self.tmp, "table.html")
+        with mock.patch.object(largefile, "CACHED_BLOCK_LIMIT", 100):
+            written, urls = render_large_page(source, dest, template, cache)
+        self.assertEqual(urls, ["/x.png"])
+        # only the small paragraph went through the cache
+        self.assertEqual(cache.misses, 1)
+        self.assertEqual(cache.entries()[0], 1)
+        cache.close()
+        with open(source) as f:
+            self.assertEqual(self.read(dest), render_page(f.read(), template))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,10 @@
-import unittest
-from main import extract_title
+import os, shutil, tempfile, unittest
+from unittest import mock
+from main import extract_title, generate_pages_incremental
+from manifest import empty_manifest, load_manifest, save_manifest
+from assets import sync_static
+from blockcache import BlockCache
+from transforms import HeadingIds, Transforms
 
 class TestExtractTitle(unittest.TestCase):
     def test_no_title(self):
@@ -27,5 +32,133 @@ class TestExtractTitle(unittest.TestCase):
         self.assertRaises(Exception, extract_title, md)
     
 
+class TestIncrementalBuild(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.docs = os.path.join(self.tmp.name, "docs")
+        self.template = os.path.join(self.tmp.name, "template.html")
+        os.makedirs(os.path.join(self.content, "blog"))
+        self.write(self.template, "<title>{{ Title }}</title>{{ Content }}")
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\n[post](/blog/post)")
+        self.write(os.path.join(self.content, "blog", "post.md"), "# Post\n\nHello")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, "w") as f:
+            f.write(text)
+
+    def build(self, manifest, basepath="/"):
+        return generate_pages_incremental(self.content, self.template, self.docs, basepath, manifest)
+
+    def test_first_build_renders_everything(self):
+        manifest = empty_manifest()
+        self.assertEqual(self.build(manifest), (2, 2, 0, 0))
+        with open(os.path.join(self.docs, "index.html")) as f:
+            self.assertEqual(f.read(), '<title>Home</title><div><h1>Home</h1><p><a href="/blog/post">post</a></p></div>')
+
+    def test_only_changed_page_rerenders(self):
+        manifest = empty_manifest()
+        self.build(manifest)
+        self.write(os.path.join(self.content, "blog", "post.md"), "# Post\n\nHello again")
+        self.assertEqual(self.build(manifest), (1, 1, 1, 0))
+        self.assertEqual(self.build(manifest), (0, 0, 2, 0))
+
+    def test_template_or_basepath_change_rebuilds_all(self):
+        manifest = empty_manifest()
+        self.build(manifest)
+        # both pages re-render, but only the one with a link actually changes
+        self.assertEqual(self.build(manifest, basepath="/site/"), (2, 1, 0, 0))
+        self.write(self.template, "{{ Content }}")
+        self.assertEqual(self.build(manifest, basepath="/site/"), (2, 2, 0, 0))
+
+    def test_transforms_change_rebuilds_all(self):
+        manifest = empty_manifest()
+        self.build(manifest)
+        transforms = Transforms([HeadingIds()])
+        self.assertEqual(generate_pages_incremental(self.content, self.template, self.docs, "/", manifest, transforms=transforms), (2, 2, 0, 0))
+        self.assertEqual(generate_pages_incremental(self.content, self.template, self.docs, "/", manifest, transforms=transforms), (0, 0, 2, 0))
+        with open(os.path.join(self.docs, "index.html")) as f:
+            self.assertIn('<h1 id="home">Home</h1>', f.read())
+
+    def test_renderer_change_rebuilds_all(self):
+        manifest = empty_manifest()
+        self.build(manifest)
+        self.assertEqual(self.build(manifest), (0, 0, 2, 0))
+        with mock.patch("main.RENDER_VERSION", manifest["renderer"] + 1):
+            self.assertEqual(self.build(manifest), (2, 0, 0, 0))
+            self.assertEqual(self.build(manifest), (0, 0, 2, 0))
+
+    def test_deleted_source_removes_output(self):
+        manifest = empty_manifest()
+        self.build(manifest)
+        os.remove(os.path.join(self.content, "blog", "post.md"))
+        self.assertEqual(self.build(manifest), (0, 0, 1, 1))
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "blog")))
+
+    def test_changed_image_only_rebuilds_pages_that_use_it(self):
+        static = os.path.join(self.tmp.name, "static")
+        os.makedirs(os.path.join(static, "images"))
+        self.write(os.path.join(static, "images", "a.png"), "png")
+        self.write(os.path.join(self.content, "blog", "post.md"), "# Post\n\n![a](/images/a.png)")
+        manifest = empty_manifest()
+        manifest["assets"] = sync_static(static, self.docs)[0]
+        self.build(manifest)
+        self.assertEqual(manifest["pages"]["blog/post.md"]["dependencies"], {"images/a.png": "3:" + str(os.stat(os.path.join(static, "images", "a.png")).st_mtime_ns)})
+
+        self.write(os.path.join(static, "images", "a.png"), "new png")
+        manifest["assets"] = sync_static(static, self.docs, manifest["assets"])[0]
+        self.assertEqual(self.build(manifest), (1, 0, 1, 0))
+
+    def test_identical_output_is_not_rewritten(self):
+        self.build(empty_manifest())
+        dest_path = os.path.join(self.docs, "index.html")
+        os.utime(dest_path, ns=(0, 0))
+        # a full rebuild renders both pages but writes neither
+        self.assertEqual(self.build(empty_manifest()), (2, 0, 0, 0))
+        self.assertEqual(os.stat(dest_path).st_mtime_ns, 0)
+
+    def test_parallel_build_matches_serial(self):
+        for i in range(6):
+            self.write(os.path.join(self.content, "blog", f"extra{i}.md"), f"# Extra {i}\n\n" + "- item **bold**\n" * (i * 50 + 1))
+        self.build(empty_manifest())
+        serial = {}
+        for root, dirs, files in os.walk(self.docs):
+            for name in files:
+                with open(os.path.join(root, name), "rb") as f:
+                    serial[os.path.relpath(os.path.join(root, name), self.docs)] = f.read()
+
+        shutil.rmtree(self.docs)
+        generate_pages_incremental(self.content, self.template, self.docs, "/", empty_manifest(), jobs=3)
+        for relative_path, data in serial.items():
+            with open(os.path.join(self.docs, relative_path), "rb") as f:
+                self.assertEqual(f.read(), data)
+
+    def test_block_cache_counts_parallel_workers(self):
+        cache = BlockCache(os.path.join(self.tmp.name, ".build", "blocks.sqlite"))
+        generate_pages_incremental(self.content, self.template, self.docs, "/", empty_manifest(), jobs=2, cache=cache)
+        # two paragraphs; the pages' headings are never cached
+        self.assertEqual((cache.hits, cache.misses), (0, 2))
+        with open(os.path.join(self.docs, "index.html")) as f:
+            first = f.read()
+
+        shutil.rmtree(self.docs)
+        generate_pages_incremental(self.content, self.template, self.docs, "/", empty_manifest(), cache=cache)
+        self.assertEqual((cache.hits, cache.misses), (2, 2))
+        with open(os.path.join(self.docs, "index.html")) as f:
+            self.assertEqual(f.read(), first)
+        cache.close()
+
+    def test_manifest_round_trip(self):
+        manifest = empty_manifest()
+        self.build(manifest)
+        path = os.path.join(self.tmp.name, ".build", "manifest.json")
+        save_manifest(path, manifest)
+        self.assertEqual(load_manifest(path), manifest)
+        self.assertEqual(self.build(load_manifest(path)), (0, 0, 2, 0))
+
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -1,5 +1,5 @@
-import unittest
-from markdownblock import markdown_to_blocks, block_to_block_type, markdown_to_html_node, BlockType
+import io, unittest
+from markdownblock import markdown_to_blocks, block_to_block_type, markdown_to_html_node, markdown_to_html, scan_blocks, iter_lines, split_block_ranges, BlockType
 
 class TestMarkdownBlock(unittest.TestCase):
     def test_markdown_to_blocks(self):
@@ -111,10 +111,11 @@ class TestBlockToBlockType(unittest.TestCase):
 
     def test_ordered_list(self):
         self.assertEqual(block_to_block_type("1. item 1\n2. item 2\n3. item 3"), BlockType.ORDERED_LIST)
+        # lists may start anywhere and skip numbers
+        self.assertEqual(block_to_block_type("2. item 2\n3. item 3"), BlockType.ORDERED_LIST)
+        self.assertEqual(block_to_block_type("1. item 1\n3. item 3"), BlockType.ORDERED_LIST)
         # invalid ordered list
         self.assertEqual(block_to_block_type("1.no space"), BlockType.PARAGRAPH)
-        self.assertEqual(block_to_block_type("2. item 2\n3. item 3"), BlockType.PARAGRAPH)
-        self.assertEqual(block_to_block_type("1. item 1\n3. item 3"), BlockType.PARAGRAPH)
 
     def test_mixed_content(self):
         self.assertEqual(
@@ -214,5 +215,229 @@ class TestMarkdownToHTMLNode(unittest.TestCase):
             "<div><ol><li>First item</li><li>Second item with <code>code</code></li><li>Third item</li></ol></div>"
         )
 
+class TestScanBlocks(unittest.TestCase):
+    def test_types_and_lines(self):
+        md = "# Title\n\n> quote\n> more\n\n- a\n- b\n\n1. one\n2. two\n\ntext\n  wrapped  \n"
+        self.assertEqual(
+            list(scan_blocks(iter_lines(md))),
+            [
+                (BlockType.HEADING, ["# Title"]),
+                (BlockType.QUOTE, ["> quote", "> more"]),
+                (BlockType.UNORDERED_LIST, ["- a", "- b"]),
+                (BlockType.ORDERED_LIST, ["1. one", "2. two"]),
+                (BlockType.PARAGRAPH, ["text", "  wrapped"]),
+            ],
+        )
+
+    def test_code_block_keeps_blank_lines(self):
+        md = "```\nfirst\n\nsecond\n```\nafter"
+        self.assertEqual(
+            list(scan_blocks(iter_lines(md))),
+            [
+                (BlockType.CODE, ["```", "first", "", "second", "```"]),
+                (BlockType.PARAGRAPH, ["after"]),
+            ],
+        )
+
+    def test_reads_from_file_object(self):
+        blocks = scan_blocks(io.StringIO("para one\n\npara two\n"))
+        self.assertEqual(next(blocks), (BlockType.PARAGRAPH, ["para one"]))
+        self.assertEqual(next(blocks), (BlockType.PARAGRAPH, ["para two"]))
+
+    def test_iter_lines(self):
+        self.assertEqual(list(iter_lines("a\nb\n")), ["a", "b"])
+        self.assertEqual(list(iter_lines("a\n\nb")), ["a", "", "b"])
+        self.assertEqual(list(iter_lines("")), [])
+
+    def test_code_indentation_is_kept(self):
+        md = """
+    ```
+    func main(){
+        fmt.Println("hi")
+
+    }
+    ```
+    """
+        self.assertEqual(
+            markdown_to_html_node(md).to_html(),
+            '<div><pre><code>func main(){\n    fmt.Println("hi")\n\n}\n</code></pre></div>',
+        )
+
+
+class TestParallelBlocks(unittest.TestCase):
+    def document(self):
+        parts = []
+        for i in range(300):
+            parts.append(f"## Section {i}\n\nSome **bold** text with a [link](/x/{i}).\n\n- a\n- b _{i}_\n\n```\ncode {i}\n\nmore\n```")
+        return "\n\n".join(parts)
+
+    def test_parallel_matches_serial(self):
+        md = self.document()
+        self.assertEqual(markdown_to_html(md, jobs=3, parallel_threshold=0), markdown_to_html_node(md).to_html())
+
+    def test_small_documents_stay_in_process(self):
+        md = "# small"
+        self.assertEqual(markdown_to_html(md, jobs=4), "<div><h1>small</h1></div>")
+
+    def test_ranges_keep_order(self):
+        blocks = list(scan_blocks(iter_lines(self.document())))
+        ranges = list(split_block_ranges(iter(blocks), 500))
+        self.assertGreater(len(ranges), 1)
+        self.assertEqual([block for block_range in ranges for block in block_range], blocks)
+
+
+class TestDefinitions(unittest.TestCase):
+    def test_definitions_after_use(self):
+        md = "[home][] has a note[^n].\n\n[home]: /\n[^n]: See _this_.\n"
+        self.assertEqual(
+            markdown_to_html_node(md).to_html(),
+            '<div><p><a href="/">home</a> has a note<sup id="fnref-1"><a href="#fn-1">1</a></sup>.</p>'
+            '<section class="footnotes"><ol><li id="fn-1">See <i>this</i>. <a href="#fnref-1">↩</a></li></ol></section></div>',
+        )
+
+    def test_repeated_references_get_unique_ids(self):
+        md = "a[^n] b[^n]\n\n- c[^n]\n\n[^n]: Note."
+        expected = (
+            '<div><p>a<sup id="fnref-1"><a href="#fn-1">1</a></sup> b<sup id="fnref-1-2"><a href="#fn-1">1</a></sup></p>'
+            '<ul><li>c<sup id="fnref-1-3"><a href="#fn-1">1</a></sup></li></ul>'
+            '<section class="footnotes"><ol><li id="fn-1">Note. <a href="#fnref-1">↩</a></li></ol></section></div>'
+        )
+        self.assertEqual(markdown_to_html_node(md).to_html(), expected)
+        self.assertEqual(markdown_to_html(md, jobs=2, parallel_threshold=0), expected)
+
+    def test_footnote_continuation_lines(self):
+        md = "x[^n]\n\n[^n]: First line\n    and the _second_.\n\n    indented paragraph"
+        self.assertEqual(
+            markdown_to_html_node(md).to_html(),
+            '<div><p>x<sup id="fnref-1"><a href="#fn-1">1</a></sup></p><p>indented paragraph</p>'
+            '<section class="footnotes"><ol><li id="fn-1">First line and the <i>second</i>. <a href="#fnref-1">↩</a></li></ol></section></div>',
+        )
+
+    def test_definitions_in_code_are_code(self):
+        md = "```\n[a]: /b\n```\n\n[a]"
+        self.assertEqual(markdown_to_html_node(md).to_html(), "<div><pre><code>[a]: /b\n</code></pre><p>[a]</p></div>")
+
+    def test_definition_inside_paragraph_is_text(self):
+        md = "text\n[a]: /b"
+        self.assertEqual(markdown_to_html_node(md).to_html(), "<div><p>text [a]: /b</p></div>")
+
+
+class TestTables(unittest.TestCase):
+    def test_block_type(self):
+        self.assertEqual(block_to_block_type("| a | b |\n|---|---|\n| 1 | 2 |"), BlockType.TABLE)
+        self.assertEqual(block_to_block_type("a | b\n--|--"), BlockType.TABLE)
+        # the delimiter row must match the header's columns
+        self.assertEqual(block_to_block_type("| a | b |\n|---|"), BlockType.PARAGRAPH)
+        self.assertEqual(block_to_block_type("a | b\nc | d"), BlockType.PARAGRAPH)
+
+    def test_alignment_and_inline(self):
+        md = "| Name | Qty | Price |\n|:--|:-:|--:|\n| **a** | 1 | [x](/x) |"
+        self.assertEqual(
+            markdown_to_html_node(md).to_html(),
+            '<div><table><thead><tr><th align="left">Name</th><th align="center">Qty</th><th align="right">Price</th></tr></thead>'
+            '<tbody><tr><td align="left"><b>a</b></td><td align="center">1</td><td align="right"><a href="/x">x</a></td></tr></tbody></table></div>',
+        )
+
+    def test_ragged_rows_and_escaped_pipes(self):
+        md = "| a | b |\n| --- | --- |\n| x \\| y |\n| 1 | 2 | 3 |"
+        self.assertEqual(
+            markdown_to_html_node(md).to_html(),
+            "<div><table><thead><tr><th>a</th><th>b</th></tr></thead><tbody>"
+            "<tr><td>x | y</td><td></td></tr><tr><td>1</td><td>2</td></tr></tbody></table></div>",
+        )
+
+    def test_header_only(self):
+        self.assertEqual(
+            markdown_to_html_node("a | b\n-- | --").to_html(),
+            "<div><table><thead><tr><th>a</th><th>b</th></tr></thead></table></div>",
+        )
+
+
+class TestLists(unittest.TestCase):
+    def html(self, md):
+        return markdown_to_html_node(md).to_html()
+
+    def test_nested(self):
+        md = "- a\n  - b\n    - c\n  - d\n- e"
+        self.assertEqual(self.html(md), "<div><ul><li>a<ul><li>b<ul><li>c</li></ul></li><li>d</li></ul></li><li>e</li></ul></div>")
+
+    def test_mixed_nesting(self):
+        md = "1. one\n   - bullet\n2. two"
+        self.assertEqual(self.html(md), "<div><ol><li>one<ul><li>bullet</li></ul></li><li>two</li></ol></div>")
+
+    def test_start_number(self):
+        self.assertEqual(self.html("3. c\n4. d"), '<div><ol start="3"><li>c</li><li>d</li></ol></div>')
+        self.assertEqual(self.html("1) a\n1) b"), "<div><ol><li>a</li><li>b</li></ol></div>")
+
+    def test_continuation_lines(self):
+        md = "- first\n  wrapped\nlazy\n- second"
+        self.assertEqual(self.html(md), "<div><ul><li>first wrapped lazy</li><li>second</li></ul></div>")
+
+    def test_paragraphs_across_blank_lines(self):
+        md = "- one\n\n  more\n\n- two\n\nafter"
+        self.assertEqual(self.html(md), "<div><ul><li><p>one</p><p>more</p></li><li>two</li></ul><p>after</p></div>")
+
+    def test_different_markers_make_separate_lists(self):
+        self.assertEqual(self.html("- a\n+ b"), "<div><ul><li>a</li></ul><ul><li>b</li></ul></div>")
+
+    def test_dedent_to_intermediate_indent_joins_sublist(self):
+        self.assertEqual(
+            self.html("- a\n    - deep\n  - mid\n- b"),
+            "<div><ul><li>a<ul><li>deep</li><li>mid</li></ul></li><li>b</li></ul></div>",
+        )
+        self.assertEqual(
+            self.html("- a\n    - deep\n      - deeper\n  - mid"),
+            "<div><ul><li>a<ul><li>deep<ul><li>deeper</li></ul></li><li>mid</li></ul></li></ul></div>",
+        )
+        # a different marker still starts its own list
+        self.assertEqual(
+            self.html("- a\n    - deep\n  1. mid"),
+            "<div><ul><li>a<ul><li>deep</li></ul><ol><li>mid</li></ol></li></ul></div>",
+        )
+
+    def test_empty_item(self):
+        self.assertEqual(self.html("-\n- x"), "<div><ul><li></li><li>x</li></ul></div>")
+
+    def test_depth_is_capped(self):
+        md = "\n".join(" " * depth + "- x" for depth in range(500))
+        self.assertTrue(self.html(md).startswith("<div><ul><li>x<ul>"))
+
+
+class TestEscapedOutput(unittest.TestCase):
+    def test_code_and_text(self):
+        md = "if a < b && c:\n\n```\n<div>&</div>\n```"
+        self.assertEqual(
+            markdown_to_html_node(md).to_html(),
+            "<div><p>if a &lt; b &amp;&amp; c:</p><pre><code>&lt;div&gt;&amp;&lt;/div&gt;\n</code></pre></div>",
+        )
+
+    def test_code_keeps_entities_literal(self):
+        md = 'Use `&lt;br&gt;` for &copy;.\n\n```\nx = "&amp;"\n```\n\n| `&nbsp;` |\n|---|'
+        self.assertEqual(
+            markdown_to_html_node(md).to_html(),
+            "<div><p>Use <code>&amp;lt;br&amp;gt;</code> for &copy;.</p>"
+            '<pre><code>x = "&amp;amp;"\n</code></pre>'
+            "<table><thead><tr><th><code>&amp;nbsp;</code></th></tr></thead></table></div>",
+        )
+
+    def test_links_and_tables(self):
+        md = '[<x>](/q?a=1&b="2")\n\n| a<b |\n|---|\n| `<i>` |'
+        self.assertEqual(
+            markdown_to_html_node(md).to_html(),
+            '<div><p><a href="/q?a=1&amp;b=&quot;2&quot;">&lt;x&gt;</a></p>'
+            "<table><thead><tr><th>a&lt;b</th></tr></thead><tbody><tr><td><code>&lt;i&gt;</code></td></tr></tbody></table></div>",
+        )
+
+    def test_basepath_only_touches_urls(self):
+        md = 'See [x](/a) and [ref].\n\n```\n<a href="/raw">\n```\n\n| ![i](/i.png) |\n|---|\n\n- [y](/b)\n\n[ref]: /r'
+        self.assertEqual(
+            markdown_to_html_node(md, basepath="/site/").to_html(),
+            '<div><p>See <a href="/site/a">x</a> and <a href="/site/r">ref</a>.</p>'
+            '<pre><code>&lt;a href="/raw"&gt;\n</code></pre>'
+            '<table><thead><tr><th><img src="/site/i.png" alt="i"></th></tr></thead></table>'
+            '<ul><li><a href="/site/b">y</a></li></ul></div>',
+        )
+
+
 if __name__ == "__main__":
     unittest.main()
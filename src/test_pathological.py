@@ -0,0 +1,22 @@
+import unittest
+from benchmarks import pathological_inputs, seconds_per_mb
+from markdownblock import markdown_to_html_node
+
+# generous enough for slow CI machines, far below what a quadratic path costs
+SECONDS_PER_MB_CEILING = 10.0
+INPUT_SIZE = 1 << 17
+
+class TestPathologicalInputs(unittest.TestCase):
+    def test_time_per_megabyte(self):
+        for name, markdown in pathological_inputs(INPUT_SIZE).items():
+            with self.subTest(name):
+                self.assertLess(seconds_per_mb(markdown), SECONDS_PER_MB_CEILING)
+
+    def test_malformed_emphasis_does_not_raise(self):
+        for markdown in ["my_var = other_var_name", "a **b", "`open code", "_a _b _c"]:
+            html = markdown_to_html_node(markdown).to_html()
+            self.assertEqual(html, f"<div><p>{markdown}</p></div>")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import errno, os, tempfile, unittest
+from unittest import mock
+from publish import copy_file, prepare_staging, publish, staging_path, write_file_if_changed
+
+class TestPublish(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.tmp.name, "docs")
+        os.makedirs(os.path.join(self.output, "blog"))
+        write_file_if_changed(os.path.join(self.output, "index.html"), "old index")
+        write_file_if_changed(os.path.join(self.output, "blog", "post.html"), "old post")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def test_staging_links_previous_output(self):
+        staging = prepare_staging(self.output)
+        self.assertEqual(staging, staging_path(self.output))
+        self.assertTrue(os.path.samefile(
+            os.path.join(staging, "blog", "post.html"),
+            os.path.join(self.output, "blog", "post.html"),
+        ))
+
+    def test_writes_to_staging_leave_live_output_alone(self):
+        staging = prepare_staging(self.output)
+        write_file_if_changed(os.path.join(staging, "index.html"), "new index")
+        self.assertEqual(self.read(os.path.join(self.output, "index.html")), "old index")
+
+        publish(staging, self.output)
+        self.assertEqual(self.read(os.path.join(self.output, "index.html")), "new index")
+        self.assertEqual(self.read(os.path.join(self.output, "blog", "post.html")), "old post")
+        self.assertFalse(os.path.exists(staging))
+
+    def test_empty_staging_replaces_everything(self):
+        staging = prepare_staging(self.output, link_previous=False)
+        self.assertEqual(os.listdir(staging), [])
+        write_file_if_changed(os.path.join(staging, "index.html"), "fresh")
+        publish(staging, self.output)
+        self.assertEqual(os.listdir(self.output), ["index.html"])
+
+    def test_publish_without_previous_output(self):
+        output = os.path.join(self.tmp.name, "site")
+        staging = prepare_staging(output)
+        write_file_if_changed(os.path.join(staging, "index.html"), "first")
+        publish(staging, output)
+        self.assertEqual(self.read(os.path.join(output, "index.html")), "first")
+
+    def test_leftover_staging_is_discarded(self):
+        staging = prepare_staging(self.output)
+        write_file_if_changed(os.path.join(staging, "junk.html"), "junk")
+        staging = prepare_staging(self.output)
+        self.assertFalse(os.path.exists(os.path.join(staging, "junk.html")))
+
+
+class TestCopyFile(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tmp.name, "source.bin")
+        self.destination = os.path.join(self.tmp.name, "destination.bin")
+        self.data = os.urandom(3 * (1 << 20) + 17)
+        with open(self.source, "wb") as f:
+            f.write(self.data)
+        os.utime(self.source, ns=(1000, 2000))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def check_copy(self):
+        with open(self.destination, "rb") as f:
+            self.assertEqual(f.read(), self.data)
+        self.assertEqual(os.stat(self.destination).st_mtime_ns, 2000)
+
+    def test_copy(self):
+        copy_file(self.source, self.destination)
+        self.check_copy()
+        self.assertFalse(os.path.samefile(self.source, self.destination))
+
+    def unsupported(self, *args):
+        raise OSError(errno.EXDEV, "cross-device")
+
+    def test_falls_back_to_sendfile(self):
+        with mock.patch("publish.os.copy_file_range", self.unsupported, create=True):
+            copy_file(self.source, self.destination)
+        self.check_copy()
+
+    def test_falls_back_to_read_write(self):
+        with mock.patch("publish.os.copy_file_range", self.unsupported, create=True), \
+                mock.patch("publish.os.sendfile", self.unsupported, create=True):
+            copy_file(self.source, self.destination)
+        self.check_copy()
+
+    def test_link(self):
+        copy_file(self.source, self.destination, link=True)
+        self.assertTrue(os.path.samefile(self.source, self.destination))
+
+    def test_link_falls_back_to_copy(self):
+        with mock.patch("publish.os.link", self.unsupported):
+            copy_file(self.source, self.destination, link=True)
+        self.check_copy()
+        self.assertFalse(os.path.samefile(self.source, self.destination))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import os, tempfile, unittest
+from unittest import mock
+from main import build_shard, merge_shard_outputs, generate_pages_incremental
+from manifest import empty_manifest
+from shard import page_shard, parse_shard
+
+class TestShard(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.content = os.path.join(root, "content")
+        self.static = os.path.join(root, "static")
+        self.template = os.path.join(root, "template.html")
+        self.shard_dir = os.path.join(root, ".build", "shards")
+        self.manifest_path = os.path.join(root, ".build", "manifest.json")
+        os.makedirs(self.static)
+        self.write(self.template, '<link href="/index.css">{{ Content }}')
+        self.write(os.path.join(self.static, "index.css"), "body {}")
+        for i in range(12):
+            self.write(os.path.join(self.content, f"section{i % 3}", f"page{i}.md"), f"# Page {i}\n\n[home](/)")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+
+    def read_tree(self, root):
+        tree = {}
+        for directory, dirs, files in os.walk(root):
+            for name in files:
+                path = os.path.join(directory, name)
+                with open(path, "rb") as f:
+                    tree[os.path.relpath(path, root)] = f.read()
+        return tree
+
+    def build_shards(self, count):
+        for index in range(1, count + 1):
+            build_shard((index, count), self.shard_dir, "/site/", dir_path_content=self.content, template_path=self.template, static=self.static)
+
+    def test_parse_shard(self):
+        self.assertEqual(parse_shard("2/4"), (2, 4))
+        for value in ["0/4", "5/4", "1/0", "x", "1/2/3"]:
+            with self.assertRaises(ValueError):
+                parse_shard(value)
+
+    def test_partition_is_deterministic(self):
+        paths = [f"blog/post{i}/index.md" for i in range(100)]
+        shards = [page_shard(path, 4) for path in paths]
+        self.assertEqual(shards, [page_shard(path, 4) for path in paths])
+        self.assertEqual(set(shards), {1, 2, 3, 4})
+
+    def test_shards_cover_every_page_once(self):
+        self.build_shards(3)
+        rendered = []
+        for index in range(1, 4):
+            rendered.extend(self.read_tree(os.path.join(self.shard_dir, str(index))))
+        self.assertEqual(len(rendered), 12)
+        self.assertEqual(len(set(rendered)), 12)
+
+    def test_merge_matches_single_build(self):
+        self.build_shards(3)
+        output = os.path.join(self.tmp.name, "docs")
+        merge_shard_outputs(3, self.shard_dir, self.manifest_path, output, self.static)
+
+        single = os.path.join(self.tmp.name, "single")
+        generate_pages_incremental(self.content, self.template, single, "/site/", empty_manifest())
+        expected = self.read_tree(single)
+        expected["index.css"] = b"body {}"
+        self.assertEqual(self.read_tree(output), expected)
+
+    def test_merge_requires_every_shard(self):
+        build_shard((1, 2), self.shard_dir, "/", dir_path_content=self.content, template_path=self.template, static=self.static)
+        with self.assertRaises(ValueError):
+            merge_shard_outputs(2, self.shard_dir, self.manifest_path, os.path.join(self.tmp.name, "docs"), self.static)
+
+    def test_merge_requires_the_current_renderer(self):
+        self.build_shards(2)
+        with mock.patch("shard.RENDER_VERSION", -1):
+            with self.assertRaises(ValueError):
+                merge_shard_outputs(2, self.shard_dir, self.manifest_path, os.path.join(self.tmp.name, "docs"), self.static)
+        with mock.patch("main.RENDER_VERSION", -1):
+            build_shard((2, 2), self.shard_dir, "/site/", dir_path_content=self.content, template_path=self.template, static=self.static)
+        with self.assertRaises(ValueError):
+            merge_shard_outputs(2, self.shard_dir, self.manifest_path, os.path.join(self.tmp.name, "docs"), self.static)
+
+
+if __name__ == "__main__":
+    unittest.main()
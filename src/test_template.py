@@ -0,0 +1,49 @@
+import io, unittest
+from template import Template, basepath_url, rewrite_basepath
+
+class TestTemplate(unittest.TestCase):
+    def test_segments_and_slots(self):
+        template = Template("<title>{{ Title }}</title><article>{{ Content }}</article>")
+        self.assertEqual(template.segments, ["<title>", "</title><article>", "</article>"])
+        self.assertEqual(template.slots, ["Title", "Content"])
+
+    def test_render(self):
+        template = Template("<title>{{ Title }}</title>{{ Content }}")
+        self.assertEqual(
+            template.render(Title="Home", Content="<p>hi</p>"),
+            "<title>Home</title><p>hi</p>",
+        )
+
+    def test_basepath_applied_to_template_once(self):
+        template = Template('<link href="/index.css" /><img src="/a.png" />{{ Content }}', "/site/")
+        self.assertEqual(template.segments[0], '<link href="/site/index.css" /><img src="/site/a.png" />')
+        self.assertEqual(template.render(Content=""), '<link href="/site/index.css" /><img src="/site/a.png" />')
+
+    def test_repeated_and_unknown_slots(self):
+        template = Template("{{ Title }} - {{ Title }} {{ Footer }}")
+        self.assertEqual(template.render(Title="T"), "T - T {{ Footer }}")
+
+    def test_no_slots(self):
+        self.assertEqual(Template("plain").render(Title="x"), "plain")
+
+    def test_render_to_streams_fragments(self):
+        template = Template("<title>{{ Title }}</title>{{ Content }}{{ Footer }}")
+        out = io.StringIO()
+        template.render_to(out, Title="Home", Content=(part for part in ["<p>", "hi", "</p>"]))
+        self.assertEqual(out.getvalue(), "<title>Home</title><p>hi</p>{{ Footer }}")
+
+    def test_rewrite_basepath(self):
+        self.assertEqual(rewrite_basepath('<a href="/x">', "/"), '<a href="/x">')
+        self.assertEqual(rewrite_basepath('<a href="/x">', "/site/"), '<a href="/site/x">')
+        self.assertEqual(rewrite_basepath('<a href="http://x">', "/site/"), '<a href="http://x">')
+
+    def test_basepath_url(self):
+        self.assertEqual(basepath_url("/x", "/"), "/x")
+        self.assertEqual(basepath_url("/x", "/site/"), "/site/x")
+        self.assertEqual(basepath_url("x", "/site/"), "x")
+        self.assertEqual(basepath_url("//cdn/x", "/site/"), "//cdn/x")
+        self.assertEqual(basepath_url("https://x/", "/site/"), "https://x/")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,4 @@
-import unittest
+import pickle, unittest
 
 from textnode import TextNode, TextType
 
@@ -29,6 +29,11 @@ class TestTextNode(unittest.TestCase):
         node2 = TextNode("text", TextType.ITALIC, "https://example.com")
         self.assertEqual(node, node2)
 
+    def test_slots(self):
+        node = TextNode("text", TextType.LINK, "/x")
+        self.assertFalse(hasattr(node, "__dict__"))
+        self.assertEqual(pickle.loads(pickle.dumps(node)), node)
+        self.assertEqual(repr(node), "TextNode(text, link, /x)")
 
 
 if __name__ == "__main__":
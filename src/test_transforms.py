@@ -0,0 +1,150 @@
+import os, pickle, shutil, tempfile, time, unittest
+from blockcache import BlockCache
+from htmlnode import HTMLNode
+from markdownblock import markdown_to_html, markdown_to_html_node
+from transforms import ExternalLinks, HeadingIds, LazyImages, Transform, Transforms, load_transform, slugify
+
+MARKDOWN = """# Hello, World!
+
+A [site](https://example.com) link, a [local](/about) one and ![cat](/cat.png).
+
+| [t](//cdn.example.com/x) |
+|---|
+
+- a
++ [b](http://b.example)
+
+Note[^1].
+
+[^1]: See [more](https://more.example).
+"""
+
+
+class Counter(Transform):
+    name = "counter"
+
+    def __init__(self):
+        self.seen = []
+
+    def visit(self, node):
+        self.seen.append(id(node))
+
+
+class TestBuiltins(unittest.TestCase):
+    def test_all_three(self):
+        transforms = Transforms([ExternalLinks(), HeadingIds(), LazyImages()])
+        self.assertEqual(
+            markdown_to_html_node(MARKDOWN, transforms=transforms).to_html(),
+            '<div><h1 id="hello-world">Hello, World!</h1>'
+            '<p>A <a href="https://example.com" target="_blank" rel="noopener noreferrer">site</a> link, '
+            'a <a href="/about">local</a> one and <img src="/cat.png" alt="cat" loading="lazy">.</p>'
+            '<table><thead><tr><th><a href="//cdn.example.com/x" target="_blank" rel="noopener noreferrer">t</a></th></tr></thead></table>'
+            '<ul><li>a</li></ul><ul><li><a href="http://b.example" target="_blank" rel="noopener noreferrer">b</a></li></ul>'
+            '<p>Note<sup id="fnref-1"><a href="#fn-1">1</a></sup>.</p>'
+            '<section class="footnotes"><ol><li id="fn-1">See <a href="https://more.example" target="_blank" rel="noopener noreferrer">more</a>'
+            '. <a href="#fnref-1">↩</a></li></ol></section></div>',
+        )
+
+    def test_heading_text_and_existing_ids(self):
+        node = markdown_to_html_node("## The `code` _part_", transforms=Transforms([HeadingIds()]))
+        self.assertEqual(node.to_html(), '<div><h2 id="the-code-part">The <code>code</code> <i>part</i></h2></div>')
+        heading = HTMLNode("h1", "x", None, {"id": "kept"})
+        Transforms([HeadingIds()]).apply(heading)
+        self.assertEqual(heading.props, {"id": "kept"})
+        self.assertEqual(slugify("  What's new?  2.0 "), "whats-new-20")
+
+    def test_many_repeated_headings(self):
+        def assign(count):
+            headings = [HTMLNode("h2", "Notes") for i in range(count)]
+            transforms = Transforms([HeadingIds()])
+            started = time.perf_counter()
+            for heading in headings:
+                transforms.apply(heading)
+            return time.perf_counter() - started, [heading.props["id"] for heading in headings]
+
+        seconds, ids = assign(2000)
+        self.assertEqual(ids[:3], ["notes", "notes-1", "notes-2"])
+        self.assertEqual(ids[-1], "notes-1999")
+        self.assertEqual(len(set(ids)), 2000)
+        # eight times the headings costs about eight times as much; probing from 1 costs 64 times
+        longer, ids = assign(16000)
+        self.assertEqual(len(set(ids)), 16000)
+        self.assertLess(longer, max(seconds, 0.001) * 24)
+
+    def test_no_transforms_changes_nothing(self):
+        self.assertEqual(markdown_to_html_node(MARKDOWN, transforms=Transforms()).to_html(), markdown_to_html_node(MARKDOWN).to_html())
+
+
+class TestTransforms(unittest.TestCase):
+    def test_every_node_visited_once(self):
+        counter = Counter()
+        transforms = Transforms([counter, LazyImages()])
+        markdown_to_html_node("# T\n\nsome **bold** ![i](/i.png)\n\n- a\n- b", transforms=transforms)
+        # h1, p, b, img, ul, li, li; text nodes have no tag
+        self.assertEqual(len(counter.seen), 7)
+        self.assertEqual(len(set(counter.seen)), 7)
+        self.assertEqual(transforms.visits, {"counter": 7, "lazy-images": 1})
+        self.assertGreater(transforms.seconds["counter"], 0)
+
+    def test_register_twice(self):
+        with self.assertRaises(ValueError):
+            Transforms([LazyImages(), LazyImages()])
+
+    def test_load_transform(self):
+        self.assertIsInstance(load_transform("heading-ids"), HeadingIds)
+        self.assertIsInstance(load_transform("transforms:LazyImages"), LazyImages)
+        with self.assertRaises(ValueError):
+            load_transform("nope")
+
+    def test_pickled_copy_has_fresh_counts(self):
+        transforms = Transforms([LazyImages()])
+        markdown_to_html_node("![i](/i.png)", transforms=transforms)
+        copy = pickle.loads(pickle.dumps(transforms))
+        self.assertEqual(copy.visits, {"lazy-images": 0})
+        self.assertEqual(copy.fingerprint(), transforms.fingerprint())
+
+    def test_parallel_blocks_report_their_timings(self):
+        transforms = Transforms([LazyImages()])
+        md = "\n\n".join(f"![{i}](/{i}.png)" for i in range(20))
+        html = markdown_to_html(md, jobs=2, parallel_threshold=0, transforms=transforms)
+        self.assertEqual(html, markdown_to_html_node(md, transforms=Transforms([LazyImages()])).to_html())
+        self.assertEqual(transforms.visits, {"lazy-images": 20})
+
+
+class TestTransformsAndCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "blocks.sqlite")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_transforms_are_part_of_the_key(self):
+        cache = BlockCache(self.path)
+        md = "![i](/i.png)"
+        self.assertEqual(markdown_to_html_node(md, cache).to_html(), '<div><p><img src="/i.png" alt="i"></p></div>')
+        transforms = Transforms([LazyImages()])
+        lazy = '<div><p><img src="/i.png" alt="i" loading="lazy"></p></div>'
+        self.assertEqual(markdown_to_html_node(md, cache, transforms=transforms).to_html(), lazy)
+        self.assertEqual(markdown_to_html_node(md, cache, transforms=transforms).to_html(), lazy)
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_unique_heading_ids_with_cache_and_workers(self):
+        md = "## Notes\n\ntext\n\n## Notes\n\n## Notes 1\n\n## Notes\n\n## Other"
+        expected = (
+            '<div><h2 id="notes">Notes</h2><p>text</p><h2 id="notes-1">Notes</h2>'
+            '<h2 id="notes-1-1">Notes 1</h2><h2 id="notes-2">Notes</h2><h2 id="other">Other</h2></div>'
+        )
+        transforms = Transforms([HeadingIds()])
+        self.assertEqual(markdown_to_html_node(md, transforms=transforms).to_html(), expected)
+        # a second page starts over
+        self.assertEqual(markdown_to_html_node(md, transforms=transforms).to_html(), expected)
+        cache = BlockCache(self.path)
+        for i in range(2):
+            self.assertEqual(markdown_to_html_node(md, cache, transforms=transforms).to_html(), expected)
+        cache.close()
+        self.assertEqual(markdown_to_html(md, jobs=2, parallel_threshold=0, transforms=transforms), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,18 +7,25 @@ class TextType(Enum):
     CODE = "code"
     LINK = "link"
     IMAGE = "image"
+    FOOTNOTE = "footnote"
 
 class TextNode:
-    def __init__(self, text, text_type, url=None):
+    # slots instead of a per-instance __dict__, the tokenizer makes one of these per span
+    __slots__ = ("text", "text_type", "url", "anchor")
+
+    def __init__(self, text, text_type, url=None, anchor=None):
         self.text = text
         self.text_type = text_type
         self.url = url
+        # the id of a footnote reference, unique within its page
+        self.anchor = anchor
 
     def __eq__(self,other):
         if isinstance(other, TextNode):
             return (self.text == other.text and
                     self.text_type == other.text_type and
-                    self.url == other.url)
+                    self.url == other.url and
+                    self.anchor == other.anchor)
         return False
     
     def __repr__(self):
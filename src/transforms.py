@@ -0,0 +1,197 @@
+import importlib, re, time
+
+# scheme://host and protocol-relative //host urls point off the site
+EXTERNAL_URL_PATTERN = re.compile(r"(?:[a-zA-Z][a-zA-Z0-9+.-]*:)?//")
+SLUG_STRIP_PATTERN = re.compile(r"[^\w\- ]")
+HEADING_TAGS = ("h1", "h2", "h3", "h4", "h5", "h6")
+
+
+class Transform:
+    # a plugin that changes nodes in place while a page's tree is built: visit
+    # is called once per node whose tag is in tags, or per element when tags is None
+    name = "transform"
+    tags = None
+
+    def start_page(self):
+        # reset any per-page state; only headings are sure to be visited in page order
+        pass
+
+    def visit(self, node):
+        raise NotImplementedError
+
+    def fingerprint(self):
+        # stands in for the transform and its options in block cache keys and the manifest
+        return self.name
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.fingerprint()})"
+
+
+class ExternalLinks(Transform):
+    name = "external-links"
+    tags = ("a",)
+
+    def __init__(self, target="_blank", rel="noopener noreferrer"):
+        self.target = target
+        self.rel = rel
+
+    def visit(self, node):
+        if node.props and EXTERNAL_URL_PATTERN.match(node.props.get("href", "")):
+            node.props.setdefault("target", self.target)
+            node.props.setdefault("rel", self.rel)
+
+    def fingerprint(self):
+        return f"{self.name}:{self.target}:{self.rel}"
+
+
+def node_text(node):
+    # the plain text under node, in document order
+    parts = []
+    pending = [node]
+    while pending:
+        node = pending.pop()
+        if node.value:
+            parts.append(node.value)
+        if node.children:
+            pending.extend(reversed(node.children))
+    return "".join(parts)
+
+
+def slugify(text):
+    return "-".join(SLUG_STRIP_PATTERN.sub("", text.lower()).split())
+
+
+class HeadingIds(Transform):
+    # ids come from the heading text, repeats get -1, -2, ... within a page
+    name = "heading-ids"
+    tags = HEADING_TAGS
+
+    def __init__(self):
+        self.used = set()
+        # slug -> the next suffix to try, so repeats don't probe from 1 again
+        self.counts = {}
+
+    def start_page(self):
+        self.used = set()
+        self.counts = {}
+
+    def visit(self, node):
+        if node.props and "id" in node.props:
+            self.used.add(node.props["id"])
+            return
+        slug = slugify(node_text(node))
+        if not slug:
+            return
+        number = self.counts.get(slug, 0)
+        heading_id = f"{slug}-{number}" if number else slug
+        while heading_id in self.used:
+            number += 1
+            heading_id = f"{slug}-{number}"
+        self.counts[slug] = number + 1
+        self.used.add(heading_id)
+        if node.props is None:
+            node.props = {}
+        node.props["id"] = heading_id
+
+
+class LazyImages(Transform):
+    name = "lazy-images"
+    tags = ("img",)
+
+    def visit(self, node):
+        node.props.setdefault("loading", "lazy")
+
+
+BUILTIN_TRANSFORMS = {transform.name: transform for transform in (ExternalLinks, HeadingIds, LazyImages)}
+
+
+def load_transform(spec):
+    # a built-in name, or module:attribute for a Transform class found on sys.path
+    transform = BUILTIN_TRANSFORMS.get(spec)
+    if transform is None:
+        module_name, separator, attribute = spec.partition(":")
+        if not separator:
+            raise ValueError(f"unknown transform {spec!r}, expected one of {', '.join(BUILTIN_TRANSFORMS)} or module:name")
+        transform = getattr(importlib.import_module(module_name), attribute)
+    return transform()
+
+
+class Transforms:
+    # the transforms of a build, run together in a single walk over each block's nodes
+    def __init__(self, transforms=()):
+        self.transforms = []
+        # tag -> the transforms that visit it, filled in as tags are seen
+        self.by_tag = {}
+        self.seconds = {}
+        self.visits = {}
+        for transform in transforms:
+            self.register(transform)
+
+    def register(self, transform):
+        if transform.name in self.seconds:
+            raise ValueError(f"transform {transform.name!r} is registered twice")
+        self.transforms.append(transform)
+        self.seconds[transform.name] = 0.0
+        self.visits[transform.name] = 0
+        self.by_tag = {}
+
+    def start_page(self):
+        for transform in self.transforms:
+            transform.start_page()
+
+    def transforms_for(self, tag):
+        found = self.by_tag.get(tag)
+        if found is None:
+            found = [transform for transform in self.transforms if transform.tags is None or tag in transform.tags]
+            self.by_tag[tag] = found
+        return found
+
+    def apply(self, node):
+        # visit node and everything under it once, in document order
+        seconds = self.seconds
+        visits = self.visits
+        perf_counter = time.perf_counter
+        pending = [node]
+        while pending:
+            current = pending.pop()
+            if current.tag is not None:
+                for transform in self.transforms_for(current.tag):
+                    started = perf_counter()
+                    transform.visit(current)
+                    seconds[transform.name] += perf_counter() - started
+                    visits[transform.name] += 1
+            if current.children:
+                pending.extend(reversed(current.children))
+        return node
+
+    def fingerprint(self):
+        return "\0".join(transform.fingerprint() for transform in self.transforms)
+
+    def timings(self):
+        return dict(self.seconds), dict(self.visits)
+
+    def add_timings(self, seconds, visits):
+        # counts from a worker process's copy
+        for name, value in seconds.items():
+            self.seconds[name] += value
+        for name, value in visits.items():
+            self.visits[name] += value
+
+    def report(self):
+        parts = ", ".join(
+            f"{name} {self.seconds[name]:.3f}s ({self.visits[name]} nodes)" for name in self.seconds
+        )
+        print(f"Transforms: {parts}")
+
+    def __bool__(self):
+        return bool(self.transforms)
+
+    def __getstate__(self):
+        # like BlockCache, a worker process starts with fresh counts
+        return {"transforms": self.transforms}
+
+    def __setstate__(self, state):
+        self.__init__(state["transforms"])
+
+    def __repr__(self):
+        return f"Transforms({self.transforms})"